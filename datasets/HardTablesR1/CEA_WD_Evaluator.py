@@ -11,43 +11,51 @@ class CEA_Evaluator:
         self.answer_file_path = answer_file_path
         self.round = round
 
-    def _evaluate(self, client_payload, _context={}):
-        """
-    `client_payload` will be a dict with (atleast) the following keys :
-      - submission_file_path : local file path of the submitted file
-      - aicrowd_submission_id : A unique id representing the submission
-      - aicrowd_participant_id : A unique id for participant/team submitting (if enabled)
-    """
-        submission_file_path = client_payload["submission_file_path"]
-
-        gt_cell_ent = dict()
+        # the ground truth is parsed once and reused for every submission
         gt = pd.read_csv(self.answer_file_path, delimiter=',', names=['tab_id', 'row_id', 'col_id', 'entity'],
                          dtype={'tab_id': str, 'row_id': str, 'col_id': str, 'entity': str}, keep_default_na=False)
-        for index, row in gt.iterrows():
-            cell = '%s %s %s' % (row['tab_id'], row['row_id'], row['col_id'])
-            gt_cell_ent[cell] = row['entity']
+        # a cell listed twice in the ground truth keeps its last entity
+        self.gt = gt.drop_duplicates(subset=['tab_id', 'row_id', 'col_id'], keep='last')
+
+    def _scores(self, submission_file_path):
+        """
+    Returns the F1, precision and recall of a submission file.
+    """
+        keys = ['tab_id', 'row_id', 'col_id']
+        gt = self.gt
 
-        correct_cells, annotated_cells = set(), set()
         sub = pd.read_csv(submission_file_path, delimiter=',', names=['tab_id', 'row_id', 'col_id', 'entity'],
                           dtype={'tab_id': str, 'row_id': str, 'col_id': str, 'entity': str}, keep_default_na=False)
-        for index, row in sub.iterrows():
-            cell = '%s %s %s' % (row['tab_id'], row['row_id'], row['col_id'])
-            if cell in gt_cell_ent:
-                if cell in annotated_cells:
-                    raise Exception("Duplicate cells in the submission file")
-                else:
-                    annotated_cells.add(cell)
+        # only the submitted cells that are in the ground truth are annotated
+        annotated = sub.merge(gt, on=keys, how='inner', suffixes=('', '_gt'))
+        if annotated.duplicated(subset=keys).any():
+            raise Exception("Duplicate cells in the submission file")
 
-                annotation = row['entity']
-                if not annotation.startswith('http://www.wikidata.org/entity/'):
-                    annotation = 'http://www.wikidata.org/entity/' + annotation
+        annotation = annotated['entity'].where(
+            annotated['entity'].str.startswith('http://www.wikidata.org/entity/'),
+            'http://www.wikidata.org/entity/' + annotated['entity'])
+        # the ground truth may list several entities for a cell, separated by spaces
+        gt_entities = annotated['entity_gt'].str.lower().str.split().explode()
+        is_correct = (gt_entities == annotation.str.lower().reindex(gt_entities.index)).groupby(level=0).any()
 
-                if annotation.lower() in gt_cell_ent[cell].lower().split():
-                    correct_cells.add(cell)
+        correct_cells = int(is_correct.sum())
+        annotated_cells = len(annotated)
+        gt_cells = len(gt)
 
-        precision = len(correct_cells) / len(annotated_cells) if len(annotated_cells) > 0 else 0.0
-        recall = len(correct_cells) / len(gt_cell_ent.keys())
+        precision = correct_cells / annotated_cells if annotated_cells > 0 else 0.0
+        recall = correct_cells / gt_cells
         f1 = (2 * precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
+        return f1, precision, recall
+
+    def _evaluate(self, client_payload, _context={}):
+        """
+    `client_payload` will be a dict with (atleast) the following keys :
+      - submission_file_path : local file path of the submitted file
+      - aicrowd_submission_id : A unique id representing the submission
+      - aicrowd_participant_id : A unique id for participant/team submitting (if enabled)
+    """
+        submission_file_path = client_payload["submission_file_path"]
+        f1, precision, recall = self._scores(submission_file_path)
         main_score = f1
         secondary_score = precision
         print('F1: %.3f, Precision: %.3f, Recall: %.3f' % (f1, precision, recall))
@@ -77,6 +85,8 @@ if __name__ == "__main__":
     answer_file_path = "./DataSets/HardTablesR1/Valid/gt/cea_gt.csv"
 
     d = './DataSets/HardTablesR1/Submissions/cea'
+    # Instantiate an evaluator, which loads the ground truth once
+    cea_evaluator = CEA_Evaluator(answer_file_path)
     for ff in os.listdir(d):
         _client_payload = {}
         print(ff)
@@ -84,8 +94,6 @@ if __name__ == "__main__":
 
         # Instaiate a dummy context
         _context = {}
-        # Instantiate an evaluator
-        cea_evaluator = CEA_Evaluator(answer_file_path)
         # Evaluate
         result = cea_evaluator._evaluate(_client_payload, _context)
         print(result)
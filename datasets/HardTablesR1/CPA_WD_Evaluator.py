@@ -11,6 +11,38 @@ class CPA_Evaluator:
     self.answer_file_path = answer_file_path
     self.round = round
 
+    # the ground truth is parsed once and reused for every submission
+    gt = pd.read_csv(self.answer_file_path, delimiter=',', names=['tab_id', 'sub_col_id', 'obj_col_id', 'property'],
+                     dtype={'tab_id': str, 'sub_col_id': str, 'obj_col_id': str, 'property': str}, keep_default_na=False)
+    # a column pair listed twice in the ground truth keeps its last property
+    self.gt = gt.drop_duplicates(subset=['tab_id', 'sub_col_id', 'obj_col_id'], keep='last')
+
+  def _scores(self, submission_file_path):
+    """
+    Returns the F1, precision and recall of a submission file.
+    """
+    keys = ['tab_id', 'sub_col_id', 'obj_col_id']
+    gt = self.gt
+
+    sub = pd.read_csv(submission_file_path, delimiter=',', names=['tab_id', 'sub_col_id', 'obj_col_id', 'property'],
+                      dtype={'tab_id': str, 'sub_col_id': str, 'obj_col_id': str, 'property': str}, keep_default_na=False)
+    # only the submitted column pairs that are in the ground truth are annotated
+    annotated = sub.merge(gt, on=keys, how='inner', suffixes=('', '_gt'))
+    if annotated.duplicated(subset=keys).any():
+        raise Exception("Duplicate column pairs in the submission file")
+
+    annotation = annotated['property'].where(
+        annotated['property'].str.startswith('http://www.wikidata.org/prop/direct/'),
+        'http://www.wikidata.org/prop/direct/' + annotated['property'])
+    correct_cols = int((annotation.str.lower() == annotated['property_gt'].str.lower()).sum())
+    annotated_cols = len(annotated)
+    gt_cols = len(gt)
+
+    precision = float(correct_cols) / annotated_cols if annotated_cols > 0 else 0.0
+    recall = float(correct_cols) / gt_cols
+    f1 = (2 * precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
+    return f1, precision, recall
+
   def _evaluate(self, client_payload, _context={}):
     """
     `client_payload` will be a dict with (atleast) the following keys :
@@ -19,34 +51,7 @@ class CPA_Evaluator:
       - aicrowd_participant_id : A unique id for participant/team submitting (if enabled)
     """
     submission_file_path = client_payload["submission_file_path"]
-
-    gt_cols_pro = dict()
-    gt = pd.read_csv(self.answer_file_path, delimiter=',', names=['tab_id', 'sub_col_id', 'obj_col_id', 'property'],
-                     dtype={'tab_id': str, 'sub_col_id': str, 'obj_col_id': str, 'property': str}, keep_default_na=False)
-    for index, row in gt.iterrows():
-        cols = '%s %s %s' % (row['tab_id'], row['sub_col_id'], row['obj_col_id'])
-        gt_cols_pro[cols] = row['property']
-
-    annotated_cols, correct_cols = set(), set()
-    sub = pd.read_csv(submission_file_path, delimiter=',', names=['tab_id', 'sub_col_id', 'obj_col_id', 'property'],
-                      dtype={'tab_id': str, 'sub_col_id': str, 'obj_row_id': str, 'property': str}, keep_default_na=False)
-    for index, row in sub.iterrows():
-        cols = '%s %s %s' % (row['tab_id'], row['sub_col_id'], row['obj_col_id'])
-        if cols in gt_cols_pro:
-            if cols in annotated_cols:
-                # continue
-                raise Exception("Duplicate column pairs in the submission file")
-            else:
-                annotated_cols.add(cols)
-            annotation = row['property']
-            if not annotation.startswith('http://www.wikidata.org/prop/direct/'):
-                annotation = 'http://www.wikidata.org/prop/direct/' + annotation
-            if annotation.lower() == gt_cols_pro[cols].lower():
-                correct_cols.add(cols)
-
-    precision = float(len(correct_cols)) / len(annotated_cols) if len(annotated_cols) > 0 else 0.0
-    recall = float(len(correct_cols)) / len(gt_cols_pro.keys())
-    f1 = (2 * precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
+    f1, precision, recall = self._scores(submission_file_path)
     main_score = f1
     secondary_score = precision
     print('F1: %.3f, Precision: %.3f, Recall: %.3f' % (f1, precision, recall))
@@ -75,6 +80,8 @@ if __name__ == "__main__":
     # and a sample submission is present at data/sample_submission.csv
     answer_file_path = "./DataSets/HardTablesR1/Valid/gt/cpa_gt.csv"
     d = './DataSets/HardTablesR1/Submissions/cpa'
+    # Instantiate an evaluator, which loads the ground truth once
+    cpa_evaluator = CPA_Evaluator(answer_file_path)
     for ff in os.listdir(d):
         _client_payload = {}
         print(ff)
@@ -82,8 +89,6 @@ if __name__ == "__main__":
 
         # Instaiate a dummy context
         _context = {}
-        # Instantiate an evaluator
-        cpa_evaluator = CPA_Evaluator(answer_file_path)
         # Evaluate
         result = cpa_evaluator._evaluate(_client_payload, _context)
         print(result)
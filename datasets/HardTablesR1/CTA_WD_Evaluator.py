@@ -1,6 +1,70 @@
 import pandas as pd
 import json
 import os
+from functools import lru_cache
+
+
+class TypeHierarchy:
+  """
+  The ancestors and descendants of every ground truth type with their depth,
+  keyed by lowercased type, so scoring a column only takes dict lookups.
+  """
+  def __init__(self, ancestor_file_path, descendent_file_path):
+    with open(ancestor_file_path) as f:
+        gt_ancestor = json.load(f)
+    with open(descendent_file_path) as f:
+        gt_descendent = json.load(f)
+    self.ancestors = {t.lower(): lowercase_depths(a) for t, a in gt_ancestor.items()}
+    self.descendents = {t.lower(): lowercase_depths(d) for t, d in gt_descendent.items()}
+
+  def score(self, annotation, gt_type):
+    """
+    Scores a lowercased annotated type against one ground truth type: 1 for
+    the type itself, 0.8^depth for an ancestor up to 5 levels up, 0.7^depth
+    for a descendant up to 3 levels down and 0 otherwise.
+    """
+    gt_type = gt_type.lower()
+    ancestor = self.ancestors[gt_type]
+    descendent = self.descendents[gt_type]
+    if annotation == gt_type:
+        return 1.0
+    elif annotation in ancestor:
+        depth = ancestor[annotation]
+        return pow(0.8, depth) if depth <= 5 else 0
+    elif annotation in descendent:
+        depth = descendent[annotation]
+        return pow(0.7, depth) if depth <= 3 else 0
+    return 0
+
+
+def lowercase_depths(depths):
+  lowered = dict()
+  for k, depth in depths.items():
+      lowered.setdefault(k.lower(), int(depth))
+  return lowered
+
+
+@lru_cache(maxsize=None)
+def load_type_hierarchy(gt_dir):
+  """
+  Loads the type hierarchy next to a CTA ground truth file, once per process.
+  """
+  return TypeHierarchy(os.path.join(gt_dir, 'cta_gt_ancestor.json'),
+                       os.path.join(gt_dir, 'cta_gt_descendent.json'))
+
+
+def column_score(annotation, gt_types, hierarchy):
+  """
+  Scores the type annotated for a column against its ground truth types. The
+  best match counts.
+  """
+  annotation = annotation.lower()
+  max_score = 0
+  for gt_type in gt_types.split():
+      score = hierarchy.score(annotation, gt_type)
+      if score > max_score:
+          max_score = score
+  return max_score
 
 
 class CTA_Evaluator:
@@ -12,6 +76,43 @@ class CTA_Evaluator:
     """
     self.answer_file_path = answer_file_path
     self.round = round
+    # the hierarchy files are stored next to the ground truth
+    self.hierarchy = load_type_hierarchy(os.path.dirname(answer_file_path))
+
+    # the ground truth is parsed once and reused for every submission
+    gt = pd.read_csv(self.answer_file_path, delimiter=',', names=['tab_id', 'col_id', 'type'],
+                     dtype={'tab_id': str, 'col_id': str, 'type': str}, keep_default_na=False)
+    # a column listed twice in the ground truth keeps its last type
+    self.gt = gt.drop_duplicates(subset=['tab_id', 'col_id'], keep='last')
+
+  def _scores(self, submission_file_path):
+    """
+    Returns the F1, precision and recall of a submission file.
+    """
+    keys = ['tab_id', 'col_id']
+    gt = self.gt
+
+    sub = pd.read_csv(submission_file_path, delimiter=',', names=['tab_id', 'col_id', 'annotation'],
+                      dtype={'tab_id': str, 'col_id': str, 'annotation': str}, keep_default_na=False)
+    # every submitted column counts as annotated, also those not in the ground truth
+    if sub.duplicated(subset=keys).any():
+        raise Exception("Duplicate columns in the submission file")
+    sub['annotation'] = sub['annotation'].where(
+        sub['annotation'].str.startswith('http://www.wikidata.org/entity/'),
+        'http://www.wikidata.org/entity/' + sub['annotation'])
+
+    scored = sub.merge(gt, on=keys, how='inner')
+    # summed in submission order, like the scores were added before
+    total_score = sum(
+        column_score(annotation, gt_types, self.hierarchy)
+        for annotation, gt_types in zip(scored['annotation'], scored['type']))
+    annotated_cols = len(sub)
+    gt_cols = len(gt)
+
+    precision = total_score / annotated_cols if annotated_cols > 0 else 0
+    recall = total_score / gt_cols
+    f1 = (2 * precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
+    return f1, precision, recall
 
   def _evaluate(self, client_payload, _context={}):
     """
@@ -21,65 +122,7 @@ class CTA_Evaluator:
       - aicrowd_participant_id : A unique id for participant/team submitting (if enabled)
     """
     submission_file_path = client_payload["submission_file_path"]
-
-    gt_ancestor = json.load(open("./DataSets/HardTablesR1/Valid/gt/cta_gt_ancestor.json"))
-    gt_descendent = json.load(open("./DataSets/HardTablesR1/Valid/gt/cta_gt_descendent.json"))
-
-    cols, col_type = set(), dict()
-    gt = pd.read_csv(self.answer_file_path, delimiter=',', names=['tab_id', 'col_id', 'type'],
-                     dtype={'tab_id': str, 'col_id': str, 'type': str}, keep_default_na=False)
-    for index, row in gt.iterrows():
-        col = '%s %s' % (row['tab_id'], row['col_id'])
-        gt_type = row['type']
-        col_type[col] = gt_type
-        cols.add(col)
-
-    annotated_cols = set()
-    total_score = 0
-    sub = pd.read_csv(submission_file_path, delimiter=',', names=['tab_id', 'col_id', 'annotation'],
-                      dtype={'tab_id': str, 'col_id': str, 'annotation': str}, keep_default_na=False)
-    for index, row in sub.iterrows():
-        col = '%s %s' % (row['tab_id'], row['col_id'])
-        if col in annotated_cols:
-            # continue
-            raise Exception("Duplicate columns in the submission file")
-        else:
-            annotated_cols.add(col)
-        annotation = row['annotation']
-        if not annotation.startswith('http://www.wikidata.org/entity/'):
-            annotation = 'http://www.wikidata.org/entity/' + annotation
-
-        if col in cols:
-            max_score = 0
-            for gt_type in col_type[col].split():
-                ancestor = gt_ancestor[gt_type]
-                ancestor_keys = [k.lower() for k in ancestor]
-                descendent = gt_descendent[gt_type]
-                descendent_keys = [k.lower() for k in descendent]
-                if annotation.lower() == gt_type.lower():
-                    score = 1.0
-                elif annotation.lower() in ancestor_keys:
-                    depth = int(ancestor[annotation])
-                    if depth <= 5:
-                        score = pow(0.8, depth)
-                    else:
-                        score = 0
-                elif annotation.lower() in descendent_keys:
-                    depth = int(descendent[annotation])
-                    if depth <= 3:
-                        score = pow(0.7, depth)
-                    else:
-                        score = 0
-                else:
-                    score = 0
-                if score > max_score:
-                    max_score = score
-
-            total_score += max_score
-
-    precision = total_score / len(annotated_cols) if len(annotated_cols) > 0 else 0
-    recall = total_score / len(cols)
-    f1 = (2 * precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
+    f1, precision, recall = self._scores(submission_file_path)
 
     main_score = f1
     secondary_score = precision
@@ -110,6 +153,8 @@ if __name__ == "__main__":
     # and a sample submission is present at data/sample_submission.csv
     answer_file_path = "./DataSets/HardTablesR1/Valid/gt/cta_gt.csv"
     d = './DataSets/HardTablesR1/Submissions/cta/'
+    # Instantiate an evaluator, which loads the ground truth once
+    cta_evaluator = CTA_Evaluator(answer_file_path)
     for ff in os.listdir(d):
         _client_payload = {}
         print(ff)
@@ -117,8 +162,6 @@ if __name__ == "__main__":
 
         # Instaiate a dummy context
         _context = {}
-        # Instantiate an evaluator
-        cta_evaluator = CTA_Evaluator(answer_file_path)
         # Evaluate
         result = cta_evaluator._evaluate(_client_payload, _context)
         print(result)
@@ -0,0 +1,95 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from CEA_WD_Evaluator import CEA_Evaluator
+from CPA_WD_Evaluator import CPA_Evaluator
+from CTA_WD_Evaluator import CTA_Evaluator
+
+EVALUATORS = {
+    'cea': CEA_Evaluator,
+    'cpa': CPA_Evaluator,
+    'cta': CTA_Evaluator,
+}
+
+# the evaluator of the current process, holding its parsed ground truth
+_evaluator = None
+
+
+def _init_worker(task, answer_file_path):
+    """
+    Builds the evaluator of a worker process. Forked workers inherit the
+    evaluator of the parent, so the ground truth is only parsed once.
+    """
+    global _evaluator
+    if _evaluator is None or _evaluator.answer_file_path != answer_file_path:
+        _evaluator = EVALUATORS[task](answer_file_path)
+
+
+def _score(submission_file_path):
+    try:
+        f1, precision, recall = _evaluator._scores(submission_file_path)
+    except Exception as e:
+        return submission_file_path, None, None, None, str(e)
+    return submission_file_path, f1, precision, recall, None
+
+
+def evaluate_submissions(task, answer_file_path, submission_file_paths, processes=None):
+    """
+    Scores many submissions against the same ground truth, which is parsed
+    once and kept in memory. Submissions are scored in parallel processes,
+    and a submission that fails to score gets its error message instead.
+
+    `submission_file_paths` can be any iterable of file paths, e.g. a
+    directory listing or a generator of files as they are written.
+
+    Yields (submission_file_path, f1, precision, recall, error) per
+    submission, in the order they were given.
+    """
+    _init_worker(task, answer_file_path)
+    if processes is not None and processes <= 1:
+        for submission_file_path in submission_file_paths:
+            yield _score(submission_file_path)
+        return
+
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(task, answer_file_path)) as executor:
+        yield from executor.map(_score, submission_file_paths)
+
+
+def submission_files(directory):
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory))
+            if os.path.isfile(os.path.join(directory, f))]
+
+
+def comparison_table(results):
+    """
+    Formats the scores of several submissions as a single table, best F1
+    first. Submissions that failed to score are listed last with their error.
+    """
+    results = list(results)
+    scored = sorted((r for r in results if r[4] is None), key=lambda r: -r[1])
+    failed = [r for r in results if r[4] is not None]
+
+    names = [os.path.basename(r[0]) for r in scored + failed]
+    width = max([len('submission')] + [len(name) for name in names])
+    lines = [f"{'submission':<{width}}  {'F1':>6}  {'prec.':>6}  {'recall':>6}"]
+    for name, (_, f1, precision, recall, error) in zip(names, scored + failed):
+        if error is None:
+            lines.append(f"{name:<{width}}  {f1:>6.3f}  {precision:>6.3f}  {recall:>6.3f}")
+        else:
+            lines.append(f"{name:<{width}}  error: {error}")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Score a directory of submissions against one ground truth.')
+    parser.add_argument('task', choices=sorted(EVALUATORS))
+    parser.add_argument('--gt', help='the ground truth file, by default the Valid ground truth of the task')
+    parser.add_argument('--submissions', help='the directory of submissions, by default Submissions/<task>')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    answer_file_path = args.gt or f"./DataSets/HardTablesR1/Valid/gt/{args.task}_gt.csv"
+    d = args.submissions or f"./DataSets/HardTablesR1/Submissions/{args.task}"
+    results = evaluate_submissions(args.task, answer_file_path, submission_files(d), args.processes)
+    print(comparison_table(results))
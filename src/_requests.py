@@ -1,17 +1,358 @@
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Iterator, Union
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from _types import WikiDataSearchEntitiesResponse, validate_wikidata_search_entities_response
-from util import pickle_save
+from cache import get_search_cache
+
+try:
+    import orjson
+
+    def decode_json(content: bytes):
+        return orjson.loads(content)
+
+except ImportError:
+    import json
+
+    def decode_json(content: bytes):
+        return json.loads(content)
+
 
 API_URL = "https://www.wikidata.org/w/api.php"
 
-# Request limit exception
+# only the parts of an entity SemTex uses; "info" holds the revision ID
+ENTITY_PROPS = "info|labels|descriptions|claims"
+
+# wbgetentities accepts at most 50 ids per request
+MAX_ENTITIES_PER_REQUEST = 50
+
+# seconds to wait for a connection and for each read of the response
+REQUEST_TIMEOUT = (5.0, 30.0)
+
+# Raised when a request is still rate limited or failing after every retry
 class RateLimitException(Exception):
     pass
 
 
+class RateLimiter:
+    """
+    A token bucket shared by every thread making requests. The rate is halved
+    whenever the API answers with 429 and slowly grows back towards `max_rate`
+    while requests succeed.
+
+    Parameters
+    ----------
+    max_rate : float, optional
+        The maximum number of requests per second, by default 20
+    min_rate : float, optional
+        The rate is never lowered below this, by default 1
+    burst : int, optional
+        The number of requests that may be sent at once, by default 10
+    """
+
+    def __init__(self, max_rate: float = 20.0, min_rate: float = 1.0, burst: int = 10):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.rate = max_rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until a request may be sent.
+        """
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        """
+        Slows down and stops every thread from sending requests for
+        `retry_after` seconds.
+        """
+
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + retry_after
+            )
+
+
+def parse_retry_after(value: Union[str, None]) -> Union[float, None]:
+    """
+    Parses a Retry-After header, given either in seconds or as an HTTP date.
+
+    Example
+    -------
+    >>> parse_retry_after("5")
+    5.0
+    """
+
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class WikidataClient:
+    """
+    A client for the Wikidata API that reuses a pool of keep-alive connections
+    and batches entity lookups.
+
+    Parameters
+    ----------
+    api_url : str, optional
+        The API endpoint to query, by default the public Wikidata API
+    pool_size : int, optional
+        The maximum number of pooled connections, by default 32
+    rate_limiter : Union[RateLimiter, None], optional
+        The rate limiter to throttle requests with, by default a new one
+    max_retries : int, optional
+        The number of times a rate limited or failed request is retried with
+        exponential backoff before RateLimitException is raised, by default 6
+    timeout : tuple[float, float], optional
+        The connect and read timeouts of a request in seconds. A request that
+        times out is retried like a 503, by default REQUEST_TIMEOUT
+
+    Example
+    -------
+    >>> client = WikidataClient()
+    >>> client.get_entities([76, 30])
+    {76: {...}, 30: {...}}
+    """
+
+    def __init__(
+        self,
+        api_url: str = API_URL,
+        pool_size: int = 32,
+        rate_limiter: Union[RateLimiter, None] = None,
+        max_retries: int = 6,
+        timeout: tuple[float, float] = REQUEST_TIMEOUT,
+    ):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(60.0, 2**attempt) * (0.5 + random.random() / 2)
+
+    def _get(self, params: dict) -> dict:
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(
+                    self.api_url, params=params, timeout=self.timeout
+                )
+            except requests.Timeout:
+                # a stalled server is treated like one answering 503
+                self.rate_limiter.on_rate_limited(self._backoff(attempt))
+                continue
+            except requests.ConnectionError:
+                time.sleep(self._backoff(attempt))
+                continue
+
+            # 429 and server errors such as a 502 from a proxy are retried
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.rate_limiter.on_rate_limited(
+                    retry_after if retry_after is not None else self._backoff(attempt)
+                )
+                continue
+
+            try:
+                res = decode_json(response.content)
+            except ValueError:
+                # e.g. an HTML error page sent with a 200
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self.rate_limiter.on_success()
+            return res
+
+        raise RateLimitException()
+
+    def search(self, query: str, limit: int = 30, lang: str = "en") -> list[str]:
+        """
+        Fetches a list of entities matching the given query.
+
+        Parameters
+        ----------
+        query : str
+            The mention to search for.
+        limit : int, optional
+            The maximum number of candidates to return, by default 30
+        lang : str, optional
+            The language to search in, by default "en"
+
+        Returns
+        -------
+        list[str]
+            A list of entity IDs.
+        """
+
+        params = {
+            "action": "wbsearchentities",
+            "language": lang,
+            "format": "json",
+            "search": query,
+            "limit": f"{limit}",
+        }
+        res = self._get(params)
+        if "search-continue" in res:
+            res["search_continue"] = res.pop("search-continue")
+        res: WikiDataSearchEntitiesResponse = res
+
+        # try:
+        #     validate_wikidata_search_entities_response(res)
+        # except Exception as e:
+        #     print('Error validating wikidata search entities response!!!!')
+        #     print(e)
+        #     pickle_save(res)
+
+        search_results = res["search"]
+        return [result["id"] for result in search_results]
+
+    def iter_entities(
+        self, entity_ids: Iterable[int], lang: str = "en", props: str = ENTITY_PROPS
+    ) -> Iterator[tuple[int, dict]]:
+        """
+        Fetches entities in batches of up to 50 ids per request, yielding each
+        entity as soon as its batch has been received. Duplicate ids are only
+        requested once.
+
+        Every requested id is yielded. A redirected id gets the entity it
+        redirects to. An id that does not exist, or whose request failed
+        with an API error, gets an entity marked "missing" (and "error").
+
+        Parameters
+        ----------
+        entity_ids : Iterable[int]
+            The IDs of the entities to fetch.
+        lang : str, optional
+            The language to fetch the entities in, by default "en"
+        props : str, optional
+            The parts of the entities to fetch, by default the revision,
+            labels, descriptions and claims. Sitelinks and aliases are left
+            out, which are a large share of big entities such as countries.
+
+        Returns
+        -------
+        Iterator[tuple[int, dict]]
+            (entity ID, entity) pairs.
+        """
+
+        unique_ids = list(dict.fromkeys(entity_ids))
+        for i in range(0, len(unique_ids), MAX_ENTITIES_PER_REQUEST):
+            batch = unique_ids[i : i + MAX_ENTITIES_PER_REQUEST]
+            yield from self._get_entity_batch(batch, lang, props).items()
+
+    def _get_entity_batch(
+        self, batch: list[int], lang: str, props: str
+    ) -> dict[int, dict]:
+        params = {
+            "action": "wbgetentities",
+            "languages": lang,
+            "format": "json",
+            "props": props,
+            "ids": "|".join(f"Q{entity_id}" for entity_id in batch),
+        }
+        res = self._get(params)
+
+        if "error" in res:
+            # a single bad id fails the whole request, so the ids are asked
+            # for one by one to keep the error to that id
+            if len(batch) > 1:
+                entities = {}
+                for entity_id in batch:
+                    entities.update(self._get_entity_batch([entity_id], lang, props))
+                return entities
+            return {
+                batch[0]: {
+                    "id": f"Q{batch[0]}",
+                    "missing": "",
+                    "error": res["error"].get("code"),
+                }
+            }
+
+        # redirected ids are answered under the id they redirect to
+        found = dict(res.get("entities", {}))
+        for entity in res.get("entities", {}).values():
+            if "redirects" in entity:
+                found[entity["redirects"]["from"]] = entity
+
+        return {
+            entity_id: found.get(f"Q{entity_id}", {"id": f"Q{entity_id}", "missing": ""})
+            for entity_id in batch
+        }
+
+    def get_entities(
+        self, entity_ids: Iterable[int], lang: str = "en", props: str = ENTITY_PROPS
+    ) -> dict[int, dict]:
+        """
+        Fetches entities in batches of up to 50 ids per request.
+
+        Parameters
+        ----------
+        entity_ids : Iterable[int]
+            The IDs of the entities to fetch.
+        lang : str, optional
+            The language to fetch the entities in, by default "en"
+        props : str, optional
+            The parts of the entities to fetch, by default those SemTex uses.
+
+        Returns
+        -------
+        dict[int, dict]
+            The entities, keyed by ID.
+        """
+
+        return dict(self.iter_entities(entity_ids, lang, props))
+
+    def get_entity(self, entity_id: int, lang: str = "en", props: str = ENTITY_PROPS) -> dict:
+        return self.get_entities([entity_id], lang, props)[entity_id]
+
+
+# shared by all callers so connections are kept alive between requests
+client = WikidataClient()
+
+
 def wikidata_entity_search(query: str, limit: int = 30, lang: str = "en") -> list[str]:
     """
     Fetches a list of entities matching the given query from the Wikidata API.
+    Results are cached, and identical searches running concurrently are only
+    sent once.
 
     Parameters
     ----------
@@ -33,33 +374,7 @@ def wikidata_entity_search(query: str, limit: int = 30, lang: str = "en") -> lis
     ['Q76', 'Q47513588', 'Q59661289']
     """
 
-    params = {
-        "action": "wbsearchentities",
-        "language": lang,
-        "format": "json",
-        "search": query,
-        "limit": f"{limit}",
-    }
-    data = requests.get(API_URL, params=params)
-    if data.status_code == 429:
-        raise RateLimitException()
-
-    res = data.json()
-    if "search-continue" in res:
-        res["search_continue"] = res.pop("search-continue")
-    res: WikiDataSearchEntitiesResponse = res
-
-    # try:
-    #     validate_wikidata_search_entities_response(res)
-    # except Exception as e:
-    #     print('Error validating wikidata search entities response!!!!')
-    #     print(e)
-    #     pickle_save(res)
-
-    search_results = res["search"]
-    entity_ids = [result["id"] for result in search_results]
-
-    return entity_ids
+    return get_search_cache().get_or_search(query, limit, lang, client.search)
 
 
 def wikidata_get_entity(entity_id: int, lang: str = "en") -> dict:
@@ -83,15 +398,30 @@ def wikidata_get_entity(entity_id: int, lang: str = "en") -> dict:
     >>> wikidata_get_entity(76)
     """
 
-    params = {
-        "action": "wbgetentities",
-        "languages": lang,
-        "format": "json",
-        "ids": f"Q{entity_id}",
-    }
+    return client.get_entity(entity_id, lang)
 
-    data = requests.get(API_URL, params=params)
-    if data.status_code == 429:
-        raise RateLimitException()
 
-    return data.json()["entities"][f"Q{entity_id}"]
+def wikidata_get_entities(entity_ids: Iterable[int], lang: str = "en") -> Iterator[tuple[int, dict]]:
+    """
+    Fetches several entities from the Wikidata API, batching up to 50 ids per
+    request.
+
+    Parameters
+    ----------
+    entity_ids : Iterable[int]
+        The IDs of the entities to fetch.
+    lang : str, optional
+        The language to fetch the entities in, by default "en"
+
+    Returns
+    -------
+    Iterator[tuple[int, dict]]
+        (entity ID, entity) pairs, yielded batch by batch.
+
+    Example
+    -------
+    >>> dict(wikidata_get_entities([76, 30]))
+    {76: {...}, 30: {...}}
+    """
+
+    return client.iter_entities(entity_ids, lang)
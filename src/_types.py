@@ -42,6 +42,17 @@ Claim = TypedDict("Claim", {"type": ClaimType, "value": str})
 
 DiscoveredEntity = TypedDict("DiscoveredEntity", {"candidate": str, "index": int})
 
+EntityInfo = TypedDict(
+    "EntityInfo",
+    {
+        "title": str,
+        "description": str,
+        "instances": list[int],
+        "subclasses": list[int],
+        "revision": Union[int, None],
+    },
+)
+
 class SearchInfo(TypedDict):
     search: str
 
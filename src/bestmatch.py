@@ -1,5 +1,7 @@
 import Levenshtein
 
+EXHAUSTIVE_WORDS = 10
+
 
 def generate_title_permutations(title):
     # remove " - Wikidata" from title
@@ -24,6 +26,195 @@ def compare_title_permutations_with_query(title, query):
     return [(p, 1 - Levenshtein.ratio(query.lower(), p.lower())) for p in permutations]
 
 
+def segment_lcs(piece, char_masks, m):
+    """
+    For every start position j of the query, finds where the longest common
+    subsequence of `piece` and query[j:j'] grows as j' increases. Uses the
+    bit-parallel LCS algorithm, where bit t of the query masks is query[t].
+
+    Returns a list holding, per j, the (j', lcs) pairs at which the LCS first
+    reaches each of its values, starting with (j, 0).
+    """
+
+    steps = []
+    for j in range(m + 1):
+        width = m - j
+        full = (1 << width) - 1
+        v = full
+        for c in piece:
+            u = v & (char_masks.get(c, 0) >> j)
+            v = ((v + u) | (v - u)) & full
+        # every zero bit of v is a query position where the LCS grows
+        matched = ~v & full
+        points = [(j, 0)]
+        lcs = 0
+        while matched:
+            low = matched & -matched
+            lcs += 1
+            points.append((j + low.bit_length(), lcs))
+            matched ^= low
+        steps.append(points)
+    return steps
+
+
+def best_title_permutation(title, query):
+    """
+    Finds the permutation of `title` (as generated by
+    `generate_title_permutations`) with the lowest Levenshtein distance to
+    `query`, without generating all 2^n permutations. When several
+    permutations are equally close, the one generated first is returned, so
+    the result is the same as scanning `compare_title_permutations_with_query`.
+
+    `Levenshtein.ratio` is 2 * LCS / (len(a) + len(b)), where LCS is the
+    longest common subsequence of the two strings. The LCS of the chosen words
+    against the query splits into the LCS of each word against its own
+    segment of the query, so for a fixed ratio r, the permutation maximising
+    2 * LCS - r * (len(query) + len(permutation)) is found by dynamic
+    programming over (word, query position). Raising r to the ratio of that
+    permutation until no permutation beats it gives the best ratio (Dinkelbach's
+    method) in polynomial time.
+
+    Parameters
+    ----------
+    title : str
+        The title of a search result.
+    query : str
+        The query to match the title against.
+
+    Returns
+    -------
+    tuple[str, float]
+        The best permutation and its distance to the query.
+
+    Example
+    -------
+    >>> best_title_permutation("Lincoln Township, Michigan - Wikidata", "lincon township")
+    ('Lincoln Township,', 0.0625)
+    """
+
+    title = title.replace(" - Wikidata", "")
+    words = title.split()
+    query = query.lower()
+
+    if 0 < len(words) <= EXHAUSTIVE_WORDS:
+        # few enough permutations that comparing them all is faster
+        perm, distance = None, float("inf")
+        for i in range(1, 2 ** len(words)):
+            candidate = " ".join(words[j] for j in range(len(words)) if i & (1 << j))
+            candidate_distance = 1 - Levenshtein.ratio(query, candidate.lower())
+            if candidate_distance < distance:
+                perm, distance = candidate, candidate_distance
+    elif EXHAUSTIVE_WORDS < len(words) <= 20:
+        mask = best_permutation_mask([word.lower() for word in words], query)
+        perm = " ".join(words[j] for j in range(len(words)) if mask & (1 << j))
+        distance = 1 - Levenshtein.ratio(query, perm.lower())
+    else:
+        if len(words) > 20:
+            print(f"Title too long: {title}")
+        perm, distance = None, float("inf")
+
+    # the untouched title is compared last, so it only wins when strictly closer
+    title_distance = 1 - Levenshtein.ratio(query, title.lower())
+    if title_distance < distance:
+        return title, title_distance
+    return perm, distance
+
+
+def best_permutation_mask(words, query):
+    """
+    Returns the smallest mask (bit k is words[k]) of the non-empty word subsets
+    with the highest Levenshtein ratio to `query`. Both are lowercased.
+    """
+
+    m = len(query)
+    char_masks = {}
+    for t, c in enumerate(query):
+        char_masks[c] = char_masks.get(c, 0) | (1 << t)
+
+    # per word, started: whether a word was chosen before it, which adds a
+    # space in front of it
+    pieces = [(word, " " + word) for word in words]
+    steps = [
+        [segment_lcs(piece, char_masks, m) for piece in word_pieces]
+        for word_pieces in pieces
+    ]
+    lengths = [(len(word), len(word) + 1) for word in words]
+    unreachable = float("-inf")
+
+    def forward(p, q):
+        # best[k][started][j]: the highest 2q * LCS - p * len over the words
+        # before k, aligned within query[:j], as (value, lcs, length)
+        best = [
+            [
+                [(0, 0, 0)] * (m + 1),
+                [(unreachable, 0, 0)] * (m + 1),
+            ]
+        ]
+        for k in range(len(words)):
+            current = best[-1]
+            chosen = list(current[1])
+            for started in (0, 1):
+                cost = p * lengths[k][started]
+                for j, (value, lcs, length) in enumerate(current[started]):
+                    if value == unreachable:
+                        continue
+                    for end, gain in steps[k][started][j]:
+                        candidate = (
+                            value + 2 * q * gain - cost,
+                            lcs + gain,
+                            length + lengths[k][started],
+                        )
+                        if candidate > chosen[end]:
+                            chosen[end] = candidate
+            # a longer query prefix can always hold the same alignment
+            for j in range(1, m + 1):
+                if chosen[j - 1] > chosen[j]:
+                    chosen[j] = chosen[j - 1]
+            best.append([current[0], chosen])
+        return best
+
+    # Dinkelbach's method on the ratio p / q, starting from 0
+    p, q = 0, 1
+    while True:
+        best = forward(p, q)
+        value, lcs, length = best[-1][1][m]
+        if value - p * m <= 0:
+            break
+        p, q = 2 * lcs, m + length
+
+    # among the subsets reaching p / q, the smallest mask leaves out the
+    # highest words first; suffix[started][j] is the best value of the words
+    # decided so far, starting from query position j
+    suffix = [[unreachable] * (m + 1), [0] * (m + 1)]
+    mask = 0
+    for k in range(len(words) - 1, -1, -1):
+        prefix = best[k]
+        without = max(
+            prefix[started][j][0] + suffix[started][j]
+            for started in (0, 1)
+            for j in range(m + 1)
+        )
+        if without - p * m >= 0:
+            continue
+
+        mask |= 1 << k
+        chosen = [[unreachable] * (m + 1), [unreachable] * (m + 1)]
+        for started in (0, 1):
+            cost = p * lengths[k][started]
+            for j in range(m + 1):
+                for end, gain in steps[k][started][j]:
+                    candidate = 2 * q * gain - cost + suffix[1][end]
+                    if candidate > chosen[started][j]:
+                        chosen[started][j] = candidate
+            # a later start can use any alignment a start beyond it can
+            for j in range(m - 1, -1, -1):
+                if chosen[started][j + 1] > chosen[started][j]:
+                    chosen[started][j] = chosen[started][j + 1]
+        suffix = chosen
+
+    return mask
+
+
 def remove_last_symbol(best_match):
     symbols = [",", ":", ";", "-", ".", " ", "?", "!"]
     while len(best_match) > 0 and best_match[-1] in symbols:
@@ -35,11 +226,10 @@ def get_best_title_match(query, titles):
     best_match = None
     lowest_distance = float("inf")
     for title in titles:
-        results = compare_title_permutations_with_query(title, query)
-        for r in results:
-            if r[1] < lowest_distance:
-                lowest_distance = r[1]
-                best_match = r[0]
+        perm, distance = best_title_permutation(title, query)
+        if distance < lowest_distance:
+            lowest_distance = distance
+            best_match = perm
     best_match = remove_last_symbol(best_match)
     if best_match is None or not is_acceptable_match(best_match):
         return query
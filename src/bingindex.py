@@ -0,0 +1,134 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Union
+from util import ROOTPATH
+
+SEARCH_RESULTS_FOLDER = f"{ROOTPATH}/datasets/BingSearchResults"
+INDEX_PATH = f"{ROOTPATH}/src/cache/bing-search-results.sqlite"
+
+
+def folder_signature(folder: str) -> str:
+    """
+    Summarizes the JSON files in a folder, so the index is rebuilt whenever a
+    file is added, removed or changed.
+    """
+
+    count, size, mtime = 0, 0, 0
+    for entry in os.scandir(folder):
+        if entry.name.endswith(".json"):
+            stat = entry.stat()
+            count += 1
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime_ns)
+    return f"{count}:{size}:{mtime}"
+
+
+def build_index(folder: str, path: str, signature: str) -> None:
+    """
+    Packs the Bing search responses in `folder` into a single SQLite file,
+    keyed by their lowercased original query. Only the parts used by the
+    suggester are kept. When several files share a query, the first file in
+    name order wins.
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE results (query TEXT PRIMARY KEY, response TEXT)")
+
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(folder, filename), "r") as f:
+            json_data = json.load(f)
+        if json_data is None or json_data.get("_type") != "SearchResponse":
+            continue
+
+        response = {
+            "_type": json_data["_type"],
+            "queryContext": json_data["queryContext"],
+        }
+        if "webPages" in json_data:
+            response["webPages"] = {}
+            if "value" in json_data["webPages"]:
+                response["webPages"]["value"] = [
+                    {"name": result["name"]} for result in json_data["webPages"]["value"]
+                ]
+        conn.execute(
+            "INSERT OR IGNORE INTO results VALUES (?, ?)",
+            (
+                json_data["queryContext"]["originalQuery"].lower(),
+                json.dumps(response, separators=(",", ":")),
+            ),
+        )
+
+    conn.execute("INSERT INTO meta VALUES ('signature', ?)", (signature,))
+    conn.commit()
+    conn.close()
+    # several processes may build at once; the last complete file wins
+    os.replace(tmp_path, path)
+
+
+class BingSearchIndex:
+    """
+    Looks up stored Bing search responses by their original query. The index
+    is built on first use, and rebuilt when the search result files change.
+
+    Parameters
+    ----------
+    folder : str, optional
+        The folder of Bing search response JSON files.
+    path : str, optional
+        The SQLite file to keep the index in.
+
+    Example
+    -------
+    >>> index = BingSearchIndex()
+    >>> index.lookup("Lincoln Township")["queryContext"]["originalQuery"]
+    'lincoln township'
+    """
+
+    def __init__(self, folder: str = SEARCH_RESULTS_FOLDER, path: str = INDEX_PATH):
+        self.folder = folder
+        self.path = path
+        self._conn: Union[sqlite3.Connection, None] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # connections must not be shared with forked worker processes
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+
+        signature = folder_signature(self.folder)
+        conn = None
+        if os.path.isfile(self.path):
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            row = conn.execute(
+                "SELECT value FROM meta WHERE key = 'signature'"
+            ).fetchone()
+            if row is None or row[0] != signature:
+                conn.close()
+                conn = None
+        if conn is None:
+            build_index(self.folder, self.path, signature)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+
+        self._conn = conn
+        self._pid = os.getpid()
+        return conn
+
+    def lookup(self, query: str) -> Union[dict, None]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT response FROM results WHERE query = ?", (query.lower(),))
+                .fetchone()
+            )
+        return json.loads(row[0]) if row is not None else None
+
+
+bing_search_index = BingSearchIndex()
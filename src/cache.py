@@ -0,0 +1,288 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Iterable, Union
+from _types import EntityInfo
+from util import ROOTPATH
+
+CACHE_FOLDER = f"{ROOTPATH}/src/cache"
+
+# entities older than this are fetched again
+ENTITY_TTL = 30 * 24 * 60 * 60
+
+# search results older than this are searched again
+SEARCH_TTL = 7 * 24 * 60 * 60
+
+SearchKey = tuple[str, int, str]
+
+
+class EntityCache:
+    """
+    A persistent SQLite store of parsed Wikidata entities, keyed by QID.
+
+    Parameters
+    ----------
+    path : str, optional
+        The SQLite file to store entities in, by default `cache/entities.sqlite`
+    ttl : Union[float, None], optional
+        The number of seconds an entity stays valid, by default 30 days. If
+        None, entities never expire.
+
+    Example
+    -------
+    >>> cache = EntityCache()
+    >>> cache.put_many({76: parse_entity_info(wikidata_get_entity(76))})
+    >>> cache.get_many([76, 30])
+    {76: {"title": "Barack Obama", ...}}
+    >>> (cache.hits, cache.misses)
+    (1, 1)
+    """
+
+    def __init__(
+        self,
+        path: str = f"{CACHE_FOLDER}/entities.sqlite",
+        ttl: Union[float, None] = ENTITY_TTL,
+    ):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            "id INTEGER PRIMARY KEY, revision INTEGER, fetched_at REAL, info TEXT)"
+        )
+        self._conn.commit()
+
+    def get_many(self, entity_ids: Iterable[int]) -> dict[int, EntityInfo]:
+        """
+        Looks up entities in the cache. Missing and expired entities are left
+        out of the result and counted as misses.
+        """
+
+        entity_ids = list(dict.fromkeys(entity_ids))
+        oldest = time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+        found: dict[int, EntityInfo] = {}
+        with self._lock:
+            # stay below SQLite's limit on the number of query parameters
+            for i in range(0, len(entity_ids), 500):
+                batch = entity_ids[i : i + 500]
+                rows = self._conn.execute(
+                    "SELECT id, fetched_at, info FROM entities "
+                    f"WHERE id IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for entity_id, fetched_at, info in rows:
+                    if fetched_at >= oldest:
+                        found[entity_id] = json.loads(info)
+
+            self.hits += len(found)
+            self.misses += len(entity_ids) - len(found)
+        return found
+
+    def get(self, entity_id: int) -> Union[EntityInfo, None]:
+        return self.get_many([entity_id]).get(entity_id)
+
+    def put_many(self, entities: dict[int, EntityInfo]) -> None:
+        now = time.time()
+        rows = [
+            (entity_id, info["revision"], now, json.dumps(info))
+            for entity_id, info in entities.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def put(self, entity_id: int, info: EntityInfo) -> None:
+        self.put_many({entity_id: info})
+
+    def invalidate(self, entity_ids: Union[Iterable[int], None] = None) -> None:
+        """
+        Removes the given entities from the cache, or every entity if no IDs
+        are given.
+        """
+
+        with self._lock:
+            if entity_ids is None:
+                self._conn.execute("DELETE FROM entities")
+            else:
+                self._conn.executemany(
+                    "DELETE FROM entities WHERE id = ?", [(i,) for i in entity_ids]
+                )
+            self._conn.commit()
+
+
+_entity_cache: Union[EntityCache, None] = None
+_entity_cache_lock = threading.Lock()
+
+
+def get_entity_cache() -> EntityCache:
+    """
+    Returns the entity cache shared by the whole process, opening it on first
+    use.
+    """
+
+    global _entity_cache
+    with _entity_cache_lock:
+        if _entity_cache is None:
+            _entity_cache = EntityCache()
+        return _entity_cache
+
+
+class SearchCache:
+    """
+    An LRU cache of entity search results keyed by (query, limit, lang), with
+    an optional persistent SQLite tier. Concurrent lookups of the same key
+    that is not cached yet share a single search.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        The number of results kept in memory, by default 10000
+    path : Union[str, None], optional
+        The SQLite file to persist results in, by default None (memory only)
+    ttl : Union[float, None], optional
+        The number of seconds a persisted result stays valid, by default 7
+        days. If None, results never expire.
+
+    Example
+    -------
+    >>> cache = SearchCache()
+    >>> cache.get_or_search("Lincoln Township", 30, "en", client.search)
+    ['Q7996268', ...]
+    >>> cache.get_or_search("Lincoln Township", 30, "en", client.search)  # no request
+    ['Q7996268', ...]
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        path: Union[str, None] = None,
+        ttl: Union[float, None] = SEARCH_TTL,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._results: OrderedDict[SearchKey, list[str]] = OrderedDict()
+        self._in_flight: dict[SearchKey, Future] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS searches (query TEXT, lim INTEGER, "
+                "lang TEXT, fetched_at REAL, ids TEXT, PRIMARY KEY (query, lim, lang))"
+            )
+            self._conn.commit()
+
+    def _remember(self, key: SearchKey, result: list[str]) -> None:
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+    def _lookup(self, key: SearchKey) -> Union[list[str], None]:
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        if self._conn is None:
+            return None
+
+        row = self._conn.execute(
+            "SELECT fetched_at, ids FROM searches WHERE query = ? AND lim = ? AND lang = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        fetched_at, ids = row
+        if self.ttl is not None and fetched_at < time.time() - self.ttl:
+            return None
+
+        result = json.loads(ids)
+        self._remember(key, result)
+        return result
+
+    def _store(self, key: SearchKey, result: list[str]) -> None:
+        self._remember(key, result)
+        if self._conn is not None:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)",
+                (*key, time.time(), json.dumps(result)),
+            )
+            self._conn.commit()
+
+    def get_or_search(
+        self,
+        query: str,
+        limit: int,
+        lang: str,
+        search: Callable[[str, int, str], list[str]],
+    ) -> list[str]:
+        """
+        Returns the cached result for the given search, calling `search` on a
+        miss. If the same search is already in flight in another thread, waits
+        for its result (or exception) instead of searching again.
+        """
+
+        key = (query, limit, lang)
+        with self._lock:
+            result = self._lookup(key)
+            if result is not None:
+                self.hits += 1
+                return list(result)
+
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                self.misses += 1
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.hits += 1
+
+        if not is_owner:
+            return list(future.result())
+
+        try:
+            result = search(query, limit, lang)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._store(key, result)
+            del self._in_flight[key]
+        future.set_result(result)
+        return list(result)
+
+
+_search_cache: Union[SearchCache, None] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """
+    Returns the search cache shared by the whole process, opening it on first
+    use.
+    """
+
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache(path=f"{CACHE_FOLDER}/searches.sqlite")
+        return _search_cache
@@ -1,24 +1,120 @@
-from _requests import wikidata_entity_search, wikidata_get_entity, RateLimitException
-from suggester import generate_suggestion
-from util import (
-    parse_entity_description,
-    parse_entity_properties,
-    parse_entity_title,
-    remove_stopwords,
-)
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import Union
+from _requests import wikidata_entity_search, wikidata_get_entities, RateLimitException
+from _types import EntityInfo
+from cache import get_entity_cache
+from features import description_overlaps, description_vectors, type_overlaps
+from featurestore import FeatureStore
+from suggester import generate_suggestions
+from util import parse_entity_info, remove_stopwords
+from concurrent.futures import ThreadPoolExecutor
+from itertools import starmap
+from typing import Callable, Union
+from weakref import WeakValueDictionary
 import Levenshtein
-import threading
 
+# the number of cells fetched at once, shared by all columns
+FETCH_WORKERS = 16
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+
+class EntityRecord:
+    """
+    The info of a Wikidata entity, shared by every candidate with its QID.
+
+    Records are interned through `entity_record` when candidates are created,
+    so a QID that is a candidate of many cells is stored (and pickled) once.
+    """
+
+    __slots__ = (
+        "id",
+        "title",
+        "description",
+        "instances",
+        "subclasses",
+        "_filtered_description",
+        "__weakref__",
+    )
 
-class Candidate:
     id: int
     title: Union[str, None]
     description: Union[str, None]
-    instances: Union[list[int], None]
-    subclasses: Union[list[int], None]
+    instances: Union[tuple[int, ...], None]
+    subclasses: Union[tuple[int, ...], None]
+
+    def __init__(
+        self,
+        id: int,
+        title: Union[str, None] = None,
+        description: Union[str, None] = None,
+        instances: Union[tuple[int, ...], None] = None,
+        subclasses: Union[tuple[int, ...], None] = None,
+    ):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.instances = instances
+        self.subclasses = subclasses
+        self._filtered_description = None
+
+    def set_info(self, info: EntityInfo):
+        self.title = info["title"]
+        self.description = info["description"]
+        self.instances = tuple(info["instances"])
+        self.subclasses = tuple(info["subclasses"])
+        self._filtered_description = None
+
+    @property
+    def filtered_description(self) -> str:
+        """
+        The description without stop words and punctuation, computed once per
+        entity.
+        """
+
+        if self._filtered_description is None:
+            self._filtered_description = remove_stopwords(self.description)
+        return self._filtered_description
+
+
+# the record of every QID that is still referenced by a candidate
+entity_records: "WeakValueDictionary[int, EntityRecord]" = WeakValueDictionary()
+
+
+def entity_record(
+    id: int,
+    title: Union[str, None] = None,
+    description: Union[str, None] = None,
+    instances: Union[list[int], None] = None,
+    subclasses: Union[list[int], None] = None,
+) -> EntityRecord:
+    """
+    Returns the shared record of a QID, creating it if needed. Info given for
+    a record that has none yet (e.g. when unpickling) is set on it.
+    """
+
+    record = entity_records.get(id)
+    if record is None:
+        record = EntityRecord(id)
+        entity_records[id] = record
+    if record.title is None and title is not None:
+        record.title = title
+        record.description = description
+        record.instances = tuple(instances)
+        record.subclasses = tuple(subclasses)
+    return record
+
+
+class Candidate:
+    __slots__ = (
+        "record",
+        "instance_overlap",
+        "subclass_overlap",
+        "description_overlap",
+        "lex_score",
+        "instance_overlap_spellchecked",
+        "subclass_overlap_spellchecked",
+        "description_overlap_spellchecked",
+    )
+
+    record: EntityRecord
 
     instance_overlap: Union[int, None]
     subclass_overlap: Union[int, None]
@@ -30,11 +126,7 @@ class Candidate:
     description_overlap_spellchecked: Union[float, None]
 
     def __init__(self, id: int):
-        self.id = id
-        self.title = None
-        self.description = None
-        self.instances = None
-        self.subclasses = None
+        self.record = entity_record(id)
         self.instance_overlap = None
         self.subclass_overlap = None
         self.description_overlap = None
@@ -43,94 +135,92 @@ class Candidate:
         self.subclass_overlap_spellchecked = None
         self.description_overlap_spellchecked = None
 
-    def fetch_info(self):
-        entity_data = wikidata_get_entity(self.id)
-        self.title = parse_entity_title(entity_data) or ""
-        self.description = parse_entity_description(entity_data) or ""
-
-        properties = parse_entity_properties(entity_data)
-        self.instances = [int(prop[1][1:]) for prop in properties if prop[0] == "P31"]
-        self.subclasses = [int(prop[1][1:]) for prop in properties if prop[0] == "P279"]
-
-    def get_description_overlap(self, other: "Candidate"):
-        if len(self.description) == 0 or len(other.description) == 0:
-            return 0.0
-        vectorizer = CountVectorizer().fit_transform(
-            [remove_stopwords(self.description), remove_stopwords(other.description)]
-        )
-        cosine_sim = cosine_similarity(vectorizer)
-        return cosine_sim[0][1]
+    @property
+    def id(self) -> int:
+        return self.record.id
 
-    def compute_features(
-        self,
-        correct: "Candidate",
-        other: list["Candidate"],
-        instance_total: int,
-        subclass_total: int,
-    ):
-        self.lex_score = Levenshtein.ratio(self.title, correct.title)
+    @property
+    def title(self) -> Union[str, None]:
+        return self.record.title
 
-        instance_overlap = 0
-        subclass_overlap = 0
-        description_overlaps = []
-        for other_candidate in other:
-            if other_candidate.id == self.id:
-                continue
-            instance_overlap += len(
-                set(self.instances).intersection(other_candidate.instances)
-            )
-            subclass_overlap += len(
-                set(self.subclasses).intersection(other_candidate.subclasses)
-            )
-            description_overlaps.append(self.get_description_overlap(other_candidate))
+    @property
+    def description(self) -> Union[str, None]:
+        return self.record.description
 
-        self.instance_overlap = (
-            instance_overlap / instance_total if instance_total > 0 else 0
-        )
-        self.subclass_overlap = (
-            subclass_overlap / subclass_total if subclass_total > 0 else 0
-        )
-        self.description_overlap = (
-            sum(description_overlaps) / len(description_overlaps)
-            if len(description_overlaps) > 0
-            else 0
-        )
+    @property
+    def filtered_description(self) -> str:
+        return self.record.filtered_description
 
-    def compute_features_spellchecked(
-        self,
-        correct: "Candidate",
-        other: list["Candidate"],
-        instance_total: int,
-        subclass_total: int,
-    ):
-        self.lex_score = Levenshtein.ratio(self.title, correct.title)
+    @property
+    def instances(self) -> Union[tuple[int, ...], None]:
+        return self.record.instances
 
-        instance_overlap = 0
-        subclass_overlap = 0
-        description_overlaps = []
-        for other_candidate in other:
-            if other_candidate.id == self.id:
-                continue
-            instance_overlap += len(
-                set(self.instances).intersection(other_candidate.instances)
-            )
-            subclass_overlap += len(
-                set(self.subclasses).intersection(other_candidate.subclasses)
-            )
-            description_overlaps.append(self.get_description_overlap(other_candidate))
+    @property
+    def subclasses(self) -> Union[tuple[int, ...], None]:
+        return self.record.subclasses
 
-        self.instance_overlap_spellchecked = (
-            instance_overlap / instance_total if instance_total > 0 else 0
-        )
-        self.subclass_overlap_spellchecked = (
-            subclass_overlap / subclass_total if subclass_total > 0 else 0
-        )
-        self.description_overlap_spellchecked = (
-            sum(description_overlaps) / len(description_overlaps)
-            if len(description_overlaps) > 0
-            else 0
+    def __getstate__(self):
+        return (
+            self.record,
+            self.instance_overlap,
+            self.subclass_overlap,
+            self.description_overlap,
+            self.lex_score,
+            self.instance_overlap_spellchecked,
+            self.subclass_overlap_spellchecked,
+            self.description_overlap_spellchecked,
         )
 
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # pickles from before candidates shared their entity records
+            self.record = entity_record(
+                state["id"],
+                state.get("title"),
+                state.get("description"),
+                state.get("instances"),
+                state.get("subclasses"),
+            )
+            for name in Candidate.__slots__[1:]:
+                setattr(self, name, state.get(name))
+            return
+        (
+            self.record,
+            self.instance_overlap,
+            self.subclass_overlap,
+            self.description_overlap,
+            self.lex_score,
+            self.instance_overlap_spellchecked,
+            self.subclass_overlap_spellchecked,
+            self.description_overlap_spellchecked,
+        ) = state
+
+    def fetch_info(self):
+        fetch_candidates_info([self])
+
+    def set_info(self, info: EntityInfo):
+        self.record.set_info(info)
+
+    def compute_lex_score(self, correct: "Candidate"):
+        # only depends on the cell's correct candidate, so both variants share it
+        self.lex_score = Levenshtein.ratio(self.title, correct.title)
+
+    def set_overlaps(
+        self,
+        instance_overlap: float,
+        subclass_overlap: float,
+        description_overlap: float,
+        spellchecked: bool = False,
+    ):
+        if spellchecked:
+            self.instance_overlap_spellchecked = instance_overlap
+            self.subclass_overlap_spellchecked = subclass_overlap
+            self.description_overlap_spellchecked = description_overlap
+        else:
+            self.instance_overlap = instance_overlap
+            self.subclass_overlap = subclass_overlap
+            self.description_overlap = description_overlap
+
     def features(self):
         return [
             self.id,
@@ -153,6 +243,48 @@ class Candidate:
         return self.title is not None
 
 
+def fetch_candidates_info(candidates: list[Candidate]) -> None:
+    """
+    Fetches the info of every candidate that has not been fetched yet. Entities
+    are read from the entity cache when possible, and the rest are fetched with
+    batched requests of up to 50 entities and added to the cache. Candidates
+    sharing an ID are only requested once.
+
+    Parameters
+    ----------
+    candidates : list[Candidate]
+        The candidates to fetch.
+    """
+
+    pending: dict[int, list[Candidate]] = {}
+    for candidate in candidates:
+        if not candidate.info_fetched():
+            pending.setdefault(candidate.id, []).append(candidate)
+
+    if len(pending) == 0:
+        return
+
+    def assign_info(entity_id: int, info: EntityInfo):
+        for candidate in pending.pop(entity_id):
+            candidate.set_info(info)
+
+    cache = get_entity_cache()
+    for entity_id, info in cache.get_many(pending.keys()).items():
+        assign_info(entity_id, info)
+
+    fetched: dict[int, EntityInfo] = {}
+    try:
+        for entity_id, entity_data in wikidata_get_entities(list(pending.keys())):
+            info = parse_entity_info(entity_data)
+            # entities that failed with an API error are asked for again next time
+            if "error" not in entity_data:
+                fetched[entity_id] = info
+            assign_info(entity_id, info)
+    finally:
+        # keep what was fetched before a rate limit was hit
+        cache.put_many(fetched)
+
+
 class CandidateSet:
     mention: str
     mention_spellchecked: Union[str, None]
@@ -161,8 +293,24 @@ class CandidateSet:
     correct_candidate: Union[Candidate, None]
     correct_id: Union[int, None]
 
-    def __init__(self, mention: str, correct_id: Union[str, None] = None):
+    # position of the cell in the dataset; None for cells pickled before it was
+    # recorded, which the FeatureStore refuses to store
+    table: Union[str, None] = None
+    row: Union[int, None] = None
+    col: Union[int, None] = None
+
+    def __init__(
+        self,
+        mention: str,
+        correct_id: Union[str, None] = None,
+        table: Union[str, None] = None,
+        row: Union[int, None] = None,
+        col: Union[int, None] = None,
+    ):
         self.mention = mention
+        self.table = table
+        self.row = row
+        self.col = col
         self.candidates = None
         self.correct_candidate = None
         self.mention_spellchecked = None
@@ -172,9 +320,17 @@ class CandidateSet:
         else:
             self.correct_id = None
 
+    def __reduce_ex__(self, protocol):
+        # a cell with candidates packs them like a column does, unless it is
+        # pickled as part of one
+        if any(vars(self).get(name) is not None for name in CANDIDATE_LISTS + CANDIDATE_FIELDS):
+            return unpack_cell, (pack_cells([self]),)
+        return super().__reduce_ex__(protocol)
+
     def get_spellchecked_mention(self):
         if self.mention_spellchecked is None:
-            self.mention_spellchecked = generate_suggestion(self.mention)
+            for _, suggestion in generate_suggestions([self.mention], processes=1):
+                self.mention_spellchecked = suggestion
 
     def fetch_candidates(self):
         if self.mention == "":
@@ -211,19 +367,15 @@ class CandidateSet:
         self.candidates_spellchecked = candidates
 
     def fetch_candidate_info(self):
-        for candidate in self.candidates:
-            if candidate.title is None:
-                candidate.fetch_info()
+        fetch_candidates_info(self.candidates)
 
     def fetch_candidate_info_spellchecked(self):
         if self.mention == self.mention_spellchecked:
             self.candidates_spellchecked = self.candidates
         else:
-            for candidate in self.candidates_spellchecked:
-                if candidate.title is None:
-                    candidate.fetch_info()
+            fetch_candidates_info(self.candidates_spellchecked)
 
-    def fetch_correct_candidate(self) -> None:
+    def find_correct_candidate(self) -> None:
         if self.correct_id is None or self.correct_candidate is not None:
             return
 
@@ -233,42 +385,39 @@ class CandidateSet:
                 return
 
         self.correct_candidate = Candidate(self.correct_id)
-        self.correct_candidate.fetch_info()
-
-    def compute_features(self, col: "Column"):
-        other_candidates: list[Candidate] = []
-        for cell in col.cells:
-            if cell.correct_id != self.correct_id:
-                other_candidates.extend(cell.candidates)
-
-        instance_total = sum(
-            [len(candidate.instances) for candidate in other_candidates]
-        )
-        subclass_total = sum(
-            [len(candidate.subclasses) for candidate in other_candidates]
-        )
 
-        for candidate in self.candidates:
-            candidate.compute_features(
-                self.correct_candidate, other_candidates, instance_total, subclass_total
-            )
-
-    def compute_features_spellchecked(self, col: "Column"):
-        other_candidates: list[Candidate] = []
-        for cell in col.cells:
-            if cell.correct_id != self.correct_id:
-                other_candidates.extend(cell.candidates_spellchecked)
-
-        instance_total = sum(
-            [len(candidate.instances) for candidate in other_candidates]
-        )
-        subclass_total = sum(
-            [len(candidate.subclasses) for candidate in other_candidates]
-        )
-
-        for candidate in self.candidates_spellchecked:
-            candidate.compute_features_spellchecked(
-                self.correct_candidate, other_candidates, instance_total, subclass_total
+    def fetch_correct_candidate(self) -> None:
+        self.find_correct_candidate()
+        if self.correct_candidate is not None:
+            fetch_candidates_info([self.correct_candidate])
+
+    def candidate_list(self, spellchecked: bool = False) -> Union[list[Candidate], None]:
+        return self.candidates_spellchecked if spellchecked else self.candidates
+
+    def compute_lex_scores(self, variants: tuple[bool, ...] = (False, True)):
+        # a candidate in both lists (e.g. an unchanged mention) is scored once
+        scored: set[int] = set()
+        for spellchecked in variants:
+            for candidate in self.candidate_list(spellchecked):
+                if id(candidate) not in scored:
+                    scored.add(id(candidate))
+                    candidate.compute_lex_score(self.correct_candidate)
+
+    def set_overlaps(
+        self,
+        instance_overlaps: list[float],
+        subclass_overlaps: list[float],
+        description_overlaps: list[float],
+        spellchecked: bool = False,
+    ):
+        for candidate, instance_overlap, subclass_overlap, description_overlap in zip(
+            self.candidate_list(spellchecked),
+            instance_overlaps,
+            subclass_overlaps,
+            description_overlaps,
+        ):
+            candidate.set_overlaps(
+                instance_overlap, subclass_overlap, description_overlap, spellchecked
             )
 
     def all_candidates_fetched(self) -> bool:
@@ -316,58 +465,120 @@ class Column:
     def add_cell(self, cell: CandidateSet):
         self.cells.append(cell)
 
-    def get_spellchecked_mentions(self):
-        for cell in self.cells:
-            cell.get_spellchecked_mention()
+    def get_spellchecked_mentions(self, processes: Union[int, None] = 1):
+        spellcheck_columns([self], processes)
 
     def fetch_cells(self):
         def fetch_worker(cell: CandidateSet):
             try:
                 cell.fetch_candidates()
-                cell.fetch_candidate_info()
-                cell.fetch_correct_candidate()
+                cell.find_correct_candidate()
                 return
             except RateLimitException:
                 return
 
-        threads = []
-        for cell in self.cells:
-            t = threading.Thread(target=fetch_worker, args=[cell])
-            t.start()
-            threads.append(t)
+        list(fetch_executor.map(fetch_worker, self.cells))
 
-        for t in threads:
-            t.join()
+        # fetch the info of every candidate in the column with batched requests
+        candidates: list[Candidate] = []
+        for cell in self.cells:
+            if cell.candidates is not None:
+                candidates.extend(cell.candidates)
+            if cell.correct_candidate is not None:
+                candidates.append(cell.correct_candidate)
+        try:
+            fetch_candidates_info(candidates)
+        except RateLimitException:
+            return
 
     def fetch_cells_spellchecked(self):
         def fetch_worker(cell: CandidateSet):
             try:
                 cell.fetch_candidates_spellchecked()
-                cell.fetch_candidate_info_spellchecked()
                 return
             except RateLimitException:
                 return
 
-        threads = []
-        for cell in self.cells:
-            t = threading.Thread(target=fetch_worker, args=[cell])
-            t.start()
-            threads.append(t)
-
-        for t in threads:
-            t.join()
+        list(fetch_executor.map(fetch_worker, self.cells))
 
-    def compute_features(self):
+        candidates: list[Candidate] = []
         for cell in self.cells:
-            cell.compute_features(self)
-        self.features_fetched = True
+            if cell.candidates_spellchecked is not None:
+                candidates.extend(cell.candidates_spellchecked)
+        try:
+            fetch_candidates_info(candidates)
+        except RateLimitException:
+            return
+
+    def compute_features(self, spellchecked: bool = False):
+        self.compute_variant_features((spellchecked,))
 
     def compute_features_spellchecked(self):
+        self.compute_variant_features((True,))
+
+    def compute_variant_features(self, variants: tuple[bool, ...] = (False, True)):
+        """
+        Computes the features of the column's candidates for each variant,
+        where False is the candidates of the mentions and True those of the
+        spellchecked mentions.
+
+        The overlaps of a column only depend on the IDs of its candidates, so
+        a variant whose candidate IDs match an already computed variant (e.g.
+        when no mention was changed by the spellchecker) reuses its overlaps.
+        The descriptions of all variants are vectorized together, and the
+        lexical score is computed once per candidate.
+
+        Parameters
+        ----------
+        variants : tuple[bool, ...], optional
+            The variants to compute, by default both.
+
+        Example
+        -------
+        >>> col.compute_variant_features()
+        >>> col.features_fetched and col.features_fetched_spellchecked
+        True
+        """
+
+        correct_ids = [cell.correct_id for cell in self.cells]
+        candidate_lists = {
+            spellchecked: [cell.candidate_list(spellchecked) for cell in self.cells]
+            for spellchecked in variants
+        }
+        vectors = description_vectors(
+            [c for lists in candidate_lists.values() for cands in lists for c in cands]
+        )
+
+        computed: dict[tuple, tuple] = {}
+        for spellchecked in variants:
+            lists = candidate_lists[spellchecked]
+            key = tuple(tuple(c.id for c in cands) for cands in lists)
+            if key not in computed:
+                computed[key] = (
+                    type_overlaps(correct_ids, lists, lambda c: c.instances),
+                    type_overlaps(correct_ids, lists, lambda c: c.subclasses),
+                    description_overlaps(correct_ids, lists, vectors),
+                )
+
+            for cell, instance, subclass, description in zip(self.cells, *computed[key]):
+                cell.set_overlaps(instance, subclass, description.tolist(), spellchecked)
+
         for cell in self.cells:
-            cell.compute_features_spellchecked(self)
-        self.features_fetched_spellchecked = True
+            cell.compute_lex_scores(variants)
+
+        for spellchecked in variants:
+            if spellchecked:
+                self.features_fetched_spellchecked = True
+            else:
+                self.features_fetched = True
+
+    def feature_vectors(self, store: Union["FeatureStore", None] = None):
+        if store is not None:
+            return (
+                store.feature_vectors(self),
+                store.feature_vectors(self, spellchecked=True),
+            )
 
-    def feature_vectors(self):
         if not self.features_fetched:
             raise Exception("Features not yet computed!")
 
@@ -385,7 +596,13 @@ class Column:
 
         return (vectors, vectors_spellchecked)
 
-    def label_vectors(self):
+    def label_vectors(self, store: Union["FeatureStore", None] = None):
+        if store is not None:
+            return [
+                store.label_vectors(self),
+                store.label_vectors(self, spellchecked=True),
+            ]
+
         if not self.features_fetched:
             raise Exception("Features not yet computed!")
 
@@ -420,3 +637,198 @@ class Column:
             if not cell.all_candidates_fetched_spellchecked():
                 return False
         return True
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        cells = pack_cells(self.cells)
+        # a column without candidates is cheaper to pickle as it is
+        if cells[1]:
+            state["cells"] = cells
+        return state
+
+    def __setstate__(self, state: dict):
+        # columns without candidates, and columns pickled before they were
+        # packed, keep their cells as objects
+        if isinstance(state["cells"], tuple):
+            state = {**state, "cells": unpack_cells(state["cells"])}
+        self.__dict__.update(state)
+
+
+# the attributes of a cell that hold a list of candidates or a single one
+CANDIDATE_LISTS = ("candidates", "candidates_spellchecked")
+CANDIDATE_FIELDS = ("correct_candidate",)
+
+# the number of values packed per candidate (its record and its features) and
+# per entity record
+CANDIDATE_WIDTH = len(Candidate.__slots__)
+RECORD_WIDTH = 5
+
+
+def pack_cells(cells: list[CandidateSet]) -> tuple:
+    """
+    Packs cells for pickling. The candidates of the cells and their entity
+    records are stored as flat tables, one row of values after the other, and
+    the cells with candidates are replaced by their attributes, referring to
+    the candidates by index. Equal titles and descriptions are stored once.
+    Unpickling two long lists is far cheaper than unpickling every candidate
+    and record as an object of its own.
+
+    Parameters
+    ----------
+    cells : list[CandidateSet]
+        The cells to pack.
+
+    Returns
+    -------
+    tuple
+        The cells, the positions of the cells that were replaced by their
+        attributes, and the candidate and record tables, which `unpack_cells`
+        turns back into the cells.
+    """
+
+    records: dict[int, int] = {}
+    record_list: list[EntityRecord] = []
+    candidates: dict[int, int] = {}
+    candidate_list: list[Candidate] = []
+
+    def candidate_index(candidate: Candidate) -> int:
+        index = candidates.get(id(candidate))
+        if index is None:
+            index = candidates[id(candidate)] = len(candidate_list)
+            candidate_list.append(candidate)
+            if candidate.id not in records:
+                records[candidate.id] = len(record_list)
+                record_list.append(candidate.record)
+        return index
+
+    packed = []
+    linked = []
+    for i, cell in enumerate(cells):
+        refs = [n for n in CANDIDATE_LISTS + CANDIDATE_FIELDS if vars(cell).get(n) is not None]
+        if not refs:
+            packed.append(cell)
+            continue
+        state = vars(cell).copy()
+        for name in refs:
+            if name in CANDIDATE_LISTS:
+                state[name] = [candidate_index(c) for c in state[name]]
+            else:
+                state[name] = candidate_index(state[name])
+        linked.append(i)
+        packed.append(state)
+
+    candidate_table = []
+    for c in candidate_list:
+        candidate_table.append(records[c.id])
+        candidate_table.extend(getattr(c, name) for name in Candidate.__slots__[1:])
+
+    strings: dict[str, str] = {}
+    record_table = []
+    for r in record_list:
+        record_table += (
+            r.id,
+            strings.setdefault(r.title, r.title),
+            strings.setdefault(r.description, r.description),
+            r.instances,
+            r.subclasses,
+        )
+    return packed, linked, candidate_table, record_table
+
+
+def unpack_cells(packed: tuple) -> list[CandidateSet]:
+    """
+    Turns the output of `pack_cells` back into cells. Candidates with the same
+    QID share a record again.
+    """
+
+    cells, linked, candidate_table, record_table = packed
+    if not linked:
+        return cells
+
+    records = list(starmap(EntityRecord, zip(*[iter(record_table)] * RECORD_WIDTH)))
+
+    candidates = []
+    for (
+        record,
+        instance_overlap,
+        subclass_overlap,
+        description_overlap,
+        lex_score,
+        instance_overlap_spellchecked,
+        subclass_overlap_spellchecked,
+        description_overlap_spellchecked,
+    ) in zip(*[iter(candidate_table)] * CANDIDATE_WIDTH):
+        candidate = Candidate.__new__(Candidate)
+        candidate.record = records[record]
+        candidate.instance_overlap = instance_overlap
+        candidate.subclass_overlap = subclass_overlap
+        candidate.description_overlap = description_overlap
+        candidate.lex_score = lex_score
+        candidate.instance_overlap_spellchecked = instance_overlap_spellchecked
+        candidate.subclass_overlap_spellchecked = subclass_overlap_spellchecked
+        candidate.description_overlap_spellchecked = description_overlap_spellchecked
+        candidates.append(candidate)
+
+    for i in linked:
+        state = cells[i]
+        for name in CANDIDATE_LISTS + CANDIDATE_FIELDS:
+            if state.get(name) is None:
+                continue
+            if name in CANDIDATE_LISTS:
+                state[name] = [candidates[index] for index in state[name]]
+            else:
+                state[name] = candidates[state[name]]
+        cells[i] = CandidateSet.__new__(CandidateSet)
+        cells[i].__dict__ = state
+    return cells
+
+
+def unpack_cell(packed: tuple) -> CandidateSet:
+    return unpack_cells(packed)[0]
+
+
+def spellcheck_columns(
+    cols: list[Column],
+    processes: Union[int, None] = None,
+    on_column_spellchecked: Union[Callable[[Column], None], None] = None,
+) -> None:
+    """
+    Spellchecks the mentions of every cell in the given columns. Each distinct
+    mention is corrected once, by a pool of processes, and its suggestion is
+    set on every cell with that mention.
+
+    Parameters
+    ----------
+    cols : list[Column]
+        The columns to spellcheck. Cells that already have a spellchecked
+        mention are skipped.
+    processes : int, optional
+        The number of worker processes, by default one per CPU core.
+    on_column_spellchecked : Callable[[Column], None], optional
+        Called with every column as soon as all of its cells are spellchecked,
+        e.g. to checkpoint it.
+
+    Example
+    -------
+    >>> spellcheck_columns(cols, on_column_spellchecked=lambda col: print(len(col.cells)))
+    """
+
+    cells_by_mention: dict[str, list[tuple[int, CandidateSet]]] = {}
+    remaining = [0] * len(cols)
+    for i, col in enumerate(cols):
+        for cell in col.cells:
+            if cell.mention_spellchecked is None:
+                cells_by_mention.setdefault(cell.mention, []).append((i, cell))
+                remaining[i] += 1
+
+    if on_column_spellchecked is not None:
+        for i, col in enumerate(cols):
+            if remaining[i] == 0:
+                on_column_spellchecked(col)
+
+    for mention, suggestion in generate_suggestions(list(cells_by_mention), processes):
+        for i, cell in cells_by_mention[mention]:
+            cell.mention_spellchecked = suggestion
+            remaining[i] -= 1
+            if remaining[i] == 0 and on_column_spellchecked is not None:
+                on_column_spellchecked(cols[i])
@@ -0,0 +1,206 @@
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Hashable, Union
+import numpy as np
+from scipy.sparse import csr_matrix
+
+if TYPE_CHECKING:
+    from classes import Candidate
+
+
+def encode(values: list[Hashable]) -> np.ndarray:
+    """
+    Maps each value to a dense integer code, e.g. ["a", "b", "a"] -> [0, 1, 0].
+    """
+
+    codes: dict[Hashable, int] = {}
+    return np.array([codes.setdefault(v, len(codes)) for v in values], dtype=np.int64)
+
+
+def similarity_within(vectors: csr_matrix, codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For every row i, sums the dot products of row i with all rows sharing its
+    code (including itself), and counts those rows.
+    """
+
+    n = vectors.shape[0]
+    membership = csr_matrix(
+        (np.ones(n), (codes, np.arange(n))), shape=(codes.max() + 1, n)
+    )
+    totals = (membership @ vectors).tocsr()
+    similarity = np.asarray(vectors.multiply(totals[codes]).sum(axis=1)).ravel()
+    counts = np.bincount(codes)[codes]
+    return similarity, counts
+
+
+def description_vectors(
+    candidates: list["Candidate"],
+) -> tuple[csr_matrix, dict[int, int]]:
+    """
+    Vectorizes the description of every distinct entity among the candidates
+    once, as L2-normalized word counts.
+
+    Parameters
+    ----------
+    candidates : list[Candidate]
+        The candidates, possibly with repeated IDs.
+
+    Returns
+    -------
+    tuple[csr_matrix, dict[int, int]]
+        The vectors, and the row of every entity ID.
+    """
+
+    rows: dict[int, int] = {}
+    documents = []
+    for c in candidates:
+        if c.id not in rows:
+            rows[c.id] = len(documents)
+            documents.append(c.filtered_description)
+
+    # e.g. a column whose cells have no candidates; sklearn rejects 0 rows
+    if len(documents) == 0:
+        return csr_matrix((0, 1)), rows
+
+    # sklearn takes over a second to import, so it is only loaded when needed
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.preprocessing import normalize
+
+    try:
+        vectors = CountVectorizer().fit_transform(documents)
+    except ValueError:
+        # no description has a single word left after removing stopwords
+        vectors = csr_matrix((len(documents), 1))
+    # rows without words stay zero, giving a similarity of 0
+    return normalize(vectors.astype(np.float64)).tocsr(), rows
+
+
+def description_overlaps(
+    correct_ids: list,
+    candidate_lists: list[list["Candidate"]],
+    vectors: Union[tuple[csr_matrix, dict[int, int]], None] = None,
+) -> list[np.ndarray]:
+    """
+    Computes the description overlap of every candidate in a column: the mean
+    cosine similarity between its description and those of all candidates in
+    cells with a different correct entity, leaving out candidates with its
+    own ID.
+
+    All descriptions are vectorized once, and the sums over the excluded
+    candidates are computed from per-cell and per-ID totals, so the cost is
+    linear in the number of candidates instead of quadratic.
+
+    Parameters
+    ----------
+    correct_ids : list
+        The correct ID of every cell in the column.
+    candidate_lists : list[list[Candidate]]
+        The candidates of every cell in the column.
+    vectors : tuple[csr_matrix, dict[int, int]], optional
+        Description vectors from `description_vectors` covering all the
+        candidates, e.g. shared by both candidate variants of a column. By
+        default the descriptions are vectorized here.
+
+    Returns
+    -------
+    list[np.ndarray]
+        The description overlap of every candidate, per cell.
+    """
+
+    lengths = [len(candidates) for candidates in candidate_lists]
+    candidates = [c for candidates in candidate_lists for c in candidates]
+    n = len(candidates)
+    if n == 0:
+        return [np.zeros(0) for _ in candidate_lists]
+
+    if vectors is None:
+        vectors = description_vectors(candidates)
+    matrix, rows = vectors
+    vectors = matrix[[rows[c.id] for c in candidates]]
+
+    cell_of = np.repeat(np.arange(len(candidate_lists)), lengths)
+    groups = encode([correct_ids[i] for i in cell_of])
+    ids = encode([c.id for c in candidates])
+    pairs = encode(list(zip(groups.tolist(), ids.tolist())))
+
+    total = vectors @ np.asarray(vectors.sum(axis=0)).ravel()
+    same_group, same_group_count = similarity_within(vectors, groups)
+    same_id, same_id_count = similarity_within(vectors, ids)
+    same_both, same_both_count = similarity_within(vectors, pairs)
+
+    # everything but the candidates sharing the cell's correct ID or the candidate's ID
+    similarity = total - same_group - same_id + same_both
+    counts = n - same_group_count - same_id_count + same_both_count
+    overlaps = np.divide(
+        similarity, counts, out=np.zeros(n), where=counts > 0
+    )
+
+    return np.split(overlaps, np.cumsum(lengths)[:-1])
+
+
+def type_overlaps(
+    correct_ids: list,
+    candidate_lists: list[list["Candidate"]],
+    types: Callable[["Candidate"], list[int]],
+) -> list[list[float]]:
+    """
+    Computes the type overlap of every candidate in a column: the number of
+    types it shares with each candidate in cells with a different correct
+    entity (leaving out candidates with its own ID), divided by the total
+    number of types of the candidates in those cells.
+
+    An inverted index from each type to the number of candidates carrying it,
+    per column, cell group and ID, gives every candidate's overlap in
+    O(|types|) instead of a pass over the whole column.
+
+    Parameters
+    ----------
+    correct_ids : list
+        The correct ID of every cell in the column.
+    candidate_lists : list[list[Candidate]]
+        The candidates of every cell in the column.
+    types : Callable[[Candidate], list[int]]
+        Returns the types of a candidate, e.g. its instances or subclasses.
+
+    Returns
+    -------
+    list[list[float]]
+        The type overlap of every candidate, per cell.
+    """
+
+    in_column: Counter = Counter()
+    in_group: dict[Hashable, Counter] = {}
+    in_id: dict[int, Counter] = {}
+    in_group_and_id: dict[tuple, Counter] = {}
+    total = 0
+    group_totals: Counter = Counter()
+
+    for correct_id, candidates in zip(correct_ids, candidate_lists):
+        for candidate in candidates:
+            candidate_types = types(candidate)
+            unique_types = set(candidate_types)
+            in_column.update(unique_types)
+            in_group.setdefault(correct_id, Counter()).update(unique_types)
+            in_id.setdefault(candidate.id, Counter()).update(unique_types)
+            in_group_and_id.setdefault((correct_id, candidate.id), Counter()).update(
+                unique_types
+            )
+            total += len(candidate_types)
+            group_totals[correct_id] += len(candidate_types)
+
+    overlaps = []
+    for correct_id, candidates in zip(correct_ids, candidate_lists):
+        # the other candidates are those in cells with a different correct ID
+        other_total = total - group_totals[correct_id]
+        cell_overlaps = []
+        for candidate in candidates:
+            group = in_group[correct_id]
+            same_id = in_id[candidate.id]
+            same_both = in_group_and_id[(correct_id, candidate.id)]
+            overlap = sum(
+                in_column[t] - group[t] - same_id[t] + same_both[t]
+                for t in set(types(candidate))
+            )
+            cell_overlaps.append(overlap / other_total if other_total > 0 else 0)
+        overlaps.append(cell_overlaps)
+
+    return overlaps
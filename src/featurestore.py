@@ -0,0 +1,201 @@
+import os
+from typing import TYPE_CHECKING
+import h5py
+import numpy as np
+
+if TYPE_CHECKING:
+    from classes import Candidate, Column
+
+KEY_DTYPE = np.dtype([("table", "S32"), ("row", "<i4"), ("col", "<i4"), ("qid", "<i8")])
+COLUMN_DTYPE = np.dtype([("table", "S32"), ("col", "<i4"), ("start", "<i8"), ("stop", "<i8")])
+FEATURE_COUNT = 5
+
+
+def variant_name(spellchecked: bool) -> str:
+    return "spellchecked" if spellchecked else "plain"
+
+
+def column_key(col: "Column") -> tuple[str, int]:
+    cell = col.cells[0]
+    if cell.table is None or cell.col is None:
+        raise Exception(
+            "The column has no position in the dataset, load it with open_dataset!"
+        )
+    return (cell.table, cell.col)
+
+
+class FeatureStore:
+    """
+    An HDF5 file holding the feature vector and label of every candidate,
+    keyed by (table, row, col, candidate QID). Rows are appended one column at
+    a time, so checkpointing a column only writes that column. Reads slice the
+    datasets on disk instead of loading the whole file.
+
+    Parameters
+    ----------
+    path : str
+        The HDF5 file. Every dataset needs its own file, e.g. one per
+        PipelineRunner run.
+    mode : str, optional
+        The h5py file mode, by default "a" (read/write, create if missing)
+
+    Example
+    -------
+    >>> store = FeatureStore(f"{runner.folder}/features.h5")
+    >>> col.compute_features()
+    >>> store.append(col)
+    >>> store.has_column(col)
+    True
+    >>> keys, features, labels = store.arrays()
+    """
+
+    def __init__(self, path: str, mode: str = "a"):
+        if mode != "r":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = h5py.File(path, mode)
+
+        self.columns: dict[str, dict[tuple[str, int], tuple[int, int]]] = {}
+        for spellchecked in [False, True]:
+            name = variant_name(spellchecked)
+            if name not in self.file:
+                if mode == "r":
+                    self.columns[name] = {}
+                    continue
+                group = self.file.create_group(name)
+                group.create_dataset("keys", (0,), KEY_DTYPE, maxshape=(None,), chunks=True)
+                group.create_dataset(
+                    "features",
+                    (0, FEATURE_COUNT),
+                    np.float64,
+                    maxshape=(None, FEATURE_COUNT),
+                    chunks=True,
+                )
+                group.create_dataset("labels", (0,), np.float64, maxshape=(None,), chunks=True)
+                group.create_dataset("columns", (0,), COLUMN_DTYPE, maxshape=(None,), chunks=True)
+
+            self.columns[name] = {
+                (table.decode(), int(col)): (int(start), int(stop))
+                for table, col, start, stop in self.file[name]["columns"][:]
+            }
+
+    def close(self) -> None:
+        self.file.close()
+
+    def has_column(self, col: "Column", spellchecked: bool = False) -> bool:
+        return (
+            len(col.cells) > 0
+            and column_key(col) in self.columns[variant_name(spellchecked)]
+        )
+
+    def append(self, col: "Column", spellchecked: bool = False) -> None:
+        """
+        Appends the features and labels of a column whose features have been
+        computed. Columns that are already stored are skipped.
+        """
+
+        if len(col.cells) == 0 or self.has_column(col, spellchecked):
+            return
+
+        # cells pickled before their position was recorded cannot be keyed
+        if any(cell.row is None for cell in col.cells):
+            raise Exception(
+                "The column has no position in the dataset, load it with open_dataset!"
+            )
+
+        keys, features, labels = [], [], []
+        for cell in col.cells:
+            candidates = cell.candidates_spellchecked if spellchecked else cell.candidates
+            for candidate in candidates:
+                keys.append((cell.table, cell.row, cell.col, candidate.id))
+                features.append(
+                    candidate.features_spellchecked()
+                    if spellchecked
+                    else candidate.features()
+                )
+                labels.append(1.0 if candidate.id == cell.correct_id else 0.0)
+
+        name = variant_name(spellchecked)
+        group = self.file[name]
+        start = group["keys"].shape[0]
+        stop = start + len(keys)
+        for dataset in ["keys", "features", "labels"]:
+            group[dataset].resize(stop, axis=0)
+        if stop > start:
+            group["keys"][start:stop] = np.array(keys, dtype=KEY_DTYPE)
+            group["features"][start:stop] = np.array(features, dtype=np.float64)
+            group["labels"][start:stop] = np.array(labels, dtype=np.float64)
+
+        table, col_index = column_key(col)
+        columns = group["columns"]
+        columns.resize(columns.shape[0] + 1, axis=0)
+        columns[-1] = np.array((table, col_index, start, stop), dtype=COLUMN_DTYPE)
+        self.columns[name][(table, col_index)] = (start, stop)
+        self.file.flush()
+
+    def _rows(self, col: "Column", spellchecked: bool, dataset: str) -> np.ndarray:
+        name = variant_name(spellchecked)
+        start, stop = self.columns[name][column_key(col)]
+        return self.file[name][dataset][start:stop]
+
+    def feature_vectors(
+        self, col: "Column", spellchecked: bool = False
+    ) -> list[tuple["Candidate", list]]:
+        """
+        Reads the stored feature vectors of a column, paired with the column's
+        candidates in the order they were appended.
+        """
+
+        candidates = [
+            candidate
+            for cell in col.cells
+            for candidate in (
+                cell.candidates_spellchecked if spellchecked else cell.candidates
+            )
+        ]
+        rows = self._rows(col, spellchecked, "features")
+        return list(zip(candidates, rows.tolist()))
+
+    def label_vectors(self, col: "Column", spellchecked: bool = False) -> list[float]:
+        return self._rows(col, spellchecked, "labels").tolist()
+
+    def load_features(self, col: "Column", spellchecked: bool = False) -> None:
+        """
+        Sets the stored features on the column's candidates, so a resumed run
+        does not have to compute them again.
+        """
+
+        keys = self._rows(col, spellchecked, "keys")
+        features = self._rows(col, spellchecked, "features")
+        i = 0
+        for cell in col.cells:
+            candidates = cell.candidates_spellchecked if spellchecked else cell.candidates
+            for candidate in candidates:
+                if keys[i]["qid"] != candidate.id:
+                    raise Exception("Stored features do not match the column!")
+                _, lex_score, instance, subclass, description = features[i].tolist()
+                candidate.lex_score = lex_score
+                if spellchecked:
+                    candidate.instance_overlap_spellchecked = instance
+                    candidate.subclass_overlap_spellchecked = subclass
+                    candidate.description_overlap_spellchecked = description
+                else:
+                    candidate.instance_overlap = instance
+                    candidate.subclass_overlap = subclass
+                    candidate.description_overlap = description
+                i += 1
+
+        if spellchecked:
+            col.features_fetched_spellchecked = True
+        else:
+            col.features_fetched = True
+
+    def arrays(
+        self, spellchecked: bool = False
+    ) -> tuple[h5py.Dataset, h5py.Dataset, h5py.Dataset]:
+        """
+        Returns the on-disk keys, features and labels of every stored
+        candidate. The datasets are only read when sliced.
+        """
+
+        group = self.file[variant_name(spellchecked)]
+        return (group["keys"], group["features"], group["labels"])
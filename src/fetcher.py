@@ -0,0 +1,201 @@
+import asyncio
+from typing import Callable, Union
+from tqdm import tqdm
+from _requests import MAX_ENTITIES_PER_REQUEST, RateLimitException
+from classes import (
+    FETCH_WORKERS,
+    Candidate,
+    CandidateSet,
+    Column,
+    fetch_candidates_info,
+    fetch_executor,
+)
+
+# how long a partial batch of entities waits for more ids before it is sent
+BATCH_DELAY = 1.0
+
+
+class EntityBatcher:
+    """
+    Collects the candidates whose info is needed by many concurrent cells and
+    fetches them in batches of up to 50 entities.
+    """
+
+    def __init__(self, run: Callable):
+        self._run = run
+        self._pending: dict[int, list[Candidate]] = {}
+        self._waiters: dict[int, asyncio.Future] = {}
+        self._timer: Union[asyncio.TimerHandle, None] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def fetch(self, candidate: Candidate) -> asyncio.Future:
+        """
+        Schedules the candidate's info to be fetched. The returned future is
+        done once the batch holding its entity has been fetched.
+        """
+
+        loop = asyncio.get_running_loop()
+        if candidate.id not in self._waiters:
+            self._waiters[candidate.id] = loop.create_future()
+        waiter = self._waiters[candidate.id]
+        self._pending.setdefault(candidate.id, []).append(candidate)
+
+        # a full batch is sent right away, which takes it out of the waiters
+        if len(self._pending) >= MAX_ENTITIES_PER_REQUEST:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(BATCH_DELAY, self._flush)
+
+        return waiter
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while len(self._pending) > 0:
+            entity_ids = list(self._pending.keys())[:MAX_ENTITIES_PER_REQUEST]
+            candidates: list[Candidate] = []
+            waiters: list[asyncio.Future] = []
+            for entity_id in entity_ids:
+                candidates.extend(self._pending.pop(entity_id))
+                waiters.append(self._waiters.pop(entity_id))
+
+            task = asyncio.create_task(self._fetch_batch(candidates, waiters))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch_batch(
+        self, candidates: list[Candidate], waiters: list[asyncio.Future]
+    ) -> None:
+        try:
+            await self._run(fetch_candidates_info, candidates)
+        except Exception as e:
+            for waiter in waiters:
+                waiter.set_exception(e)
+            return
+
+        for waiter in waiters:
+            waiter.set_result(None)
+
+
+def search_cell(cell: CandidateSet, spellchecked: bool) -> None:
+    cell.fetch_candidates()
+    cell.find_correct_candidate()
+    if spellchecked:
+        cell.fetch_candidates_spellchecked()
+
+
+def cell_candidates(cell: CandidateSet) -> list[Candidate]:
+    candidates = list(cell.candidates or [])
+    if cell.candidates_spellchecked is not None:
+        candidates.extend(cell.candidates_spellchecked)
+    if cell.correct_candidate is not None:
+        candidates.append(cell.correct_candidate)
+
+    # the spellchecked candidates are often the same objects
+    return list({id(candidate): candidate for candidate in candidates}.values())
+
+
+async def fetch_dataset_async(
+    cols: list[Column],
+    spellchecked: bool = True,
+    max_concurrency: int = FETCH_WORKERS,
+    on_column_fetched: Union[Callable[[Column], None], None] = None,
+) -> None:
+    """
+    Fetches the candidates of every column at once. Searching, fetching
+    entity info and resolving the correct candidate run as overlapping stages,
+    so a slow column does not hold up the others. Entity info is fetched in
+    batches collected across all cells of the dataset.
+
+    Parameters
+    ----------
+    cols : list[Column]
+        The columns to fetch.
+    spellchecked : bool, optional
+        Whether to also fetch the candidates of the spellchecked mentions, by
+        default True
+    max_concurrency : int, optional
+        The maximum number of requests in flight across the whole dataset, by
+        default FETCH_WORKERS
+    on_column_fetched : Union[Callable[[Column], None], None], optional
+        Called with each column as soon as all of its cells are fetched.
+    """
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(func, *args):
+        async with semaphore:
+            return await loop.run_in_executor(fetch_executor, func, *args)
+
+    is_fetched = (
+        Column.all_cells_fetched_spellchecked if spellchecked else Column.all_cells_fetched
+    )
+    cols = [col for col in cols if not (col.all_cells_fetched() and is_fetched(col))]
+
+    batcher = EntityBatcher(run)
+    progress = tqdm(total=len(cols))
+    rate_limited: list[CandidateSet] = []
+    failed: list[tuple[CandidateSet, Exception]] = []
+
+    async def fetch_cell(cell: CandidateSet) -> None:
+        # a failing cell is left unfetched and picked up by the next run, so
+        # it does not stop the rest of the dataset
+        try:
+            await run(search_cell, cell, spellchecked)
+            pending = [c for c in cell_candidates(cell) if not c.info_fetched()]
+            # every waiter is collected, as other cells share the same batches
+            results = await asyncio.gather(
+                *[batcher.fetch(c) for c in pending], return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        except RateLimitException:
+            rate_limited.append(cell)
+        except Exception as e:
+            failed.append((cell, e))
+
+    async def fetch_column(col: Column) -> None:
+        await asyncio.gather(*[fetch_cell(cell) for cell in col.cells])
+        progress.update()
+        if on_column_fetched is not None:
+            on_column_fetched(col)
+
+    await asyncio.gather(*[fetch_column(col) for col in cols])
+    progress.close()
+
+    if len(rate_limited) > 0:
+        print(
+            f"{len(rate_limited)} cells were rate limited and are left for the next run"
+        )
+    if len(failed) > 0:
+        cell, e = failed[0]
+        print(
+            f"{len(failed)} cells failed and are left for the next run, "
+            f"e.g. '{cell.mention}' in table {cell.table}: {e!r}"
+        )
+
+
+def fetch_dataset(
+    cols: list[Column],
+    spellchecked: bool = True,
+    max_concurrency: int = FETCH_WORKERS,
+    on_column_fetched: Union[Callable[[Column], None], None] = None,
+) -> None:
+    """
+    Synchronous wrapper around `fetch_dataset_async`.
+
+    Example
+    -------
+    >>> cols = open_dataset()
+    >>> fetch_dataset(cols)
+    >>> all(col.all_cells_fetched() for col in cols)
+    True
+    """
+
+    asyncio.run(
+        fetch_dataset_async(cols, spellchecked, max_concurrency, on_column_fetched)
+    )
@@ -1,157 +1,108 @@
-import Levenshtein
-from classes import Column
+from cache import get_entity_cache, get_search_cache
+from classes import Column, spellcheck_columns
+from featurestore import FeatureStore
+from fetcher import fetch_dataset
+from ranking import cea_scores, rank_cells
+from runner import PipelineRunner
 from tqdm import tqdm
-from util import (
-    ensemble_gradient_boost_regression,
-    ensemble_hist_gradient_boost_regression,
-    open_dataset,
-    pickle_load,
-    pickle_save,
-)
-
-# ----- Open dataset -----
-print("Opening dataset...")
-# cols = open_dataset(use_test_data=True)
-cols: list[Column] = pickle_load("test-data_cols-features")
-
-# ----- Preprocess dataset -----
-print("Preprocessing dataset...")
-for col in tqdm(cols):
-    col.get_spellchecked_mentions()
-pickle_save(cols)
+from training import train_ranker
+from util import open_dataset
+
 
 # ----- Fetch candidates -----
-print("Fetching candidates...")
-for col in tqdm(cols):
-    if not col.all_cells_fetched():
-        col.fetch_cells()
-        pickle_save(cols)
-
-print("Fetching spellchecked candidates...")
-i = 1
-for col in tqdm(cols):
-    if not col.all_cells_fetched_spellchecked():
-        col.fetch_cells_spellchecked()
-        pickle_save(cols, f"spellchecked-{i}")
-        i = i + 1 if i < 9 else 1
-
-# ----- Generate features -----
-print("Generating features...")
-i = 1
-for col in tqdm(cols):
-    if col.features_fetched:
-        continue
-    col.compute_features()
-    pickle_save(cols, f"cols-features-{i}")
-    i = i + 1 if i < 9 else 1
-
-print("Generating spellchecked features...")
-i = 1
-for col in tqdm(cols):
-    if col.features_fetched_spellchecked:
-        continue
-    col.compute_features_spellchecked()
-    pickle_save(cols, f"spellchecked-features-{i}")
-    i = i + 1 if i < 9 else 1
-
-features = []
-features_spellchecked = []
-labels = []
-labels_spellchecked = []
-print("Getting feature vectors...")
-for col in tqdm(cols):
-    (feature_vector, features_vector_spellchecked) = col.feature_vectors()
-    (label_vector, label_vector_spellchecked) = col.label_vectors()
-    features.extend(feature_vector)
-    features_spellchecked.extend(features_vector_spellchecked)
-    labels.extend(label_vector)
-    labels_spellchecked.extend(label_vector_spellchecked)
-
-
-# ----- Train regressor -----
-print("Training model...")
-# model = ensemble_hist_gradient_boost_regression(features, labels)
-model = pickle_load("10-03_08-26-46")
-
-
-# ----- Evaluate regressor -----
-print("Evaluating model...")
-# max_id = max(features, key=lambda x: x[0])[0]
-# for feature in features:
-#     feature[0] = feature[0] / max_id
-
-total_correct = 0
-total_incorrect = 0
-
-for col in tqdm(cols):
-    for cell in col.cells:
-        best_candidate = None
-        best_score = float("-inf")
-        for candidate in cell.candidates_spellchecked:
-            features = candidate.features_spellchecked()
-            prediction = model.predict([features])[0]
-            if prediction > best_score:
-                best_score = prediction
-                best_candidate = candidate
-        if best_candidate is None:
-            print("WTF")
-            total_correct += 1
-        elif best_candidate.id == cell.correct_candidate.id:
-            total_correct += 1
-        else:
-            total_incorrect += 1
-
-
-# for col in tqdm(cols):
-#     for cell in col.cells:
-#         cell_features = []
-#         # for candidate in cell.candidates:
-#         for candidate in cell.candidates_spellchecked:
-#             # feature = next(feature for feature in features if feature[0] == candidate.id)
-#             feature = next(feature for feature in features_spellchecked if feature[0] == candidate.id)
-#             cell_features.append(feature)
-
-#         if len(cell_features) == 0:
-#             continue
-
-#         # cp = []
-#         # for f in cell_features:
-#         #     cp.append(sum(f[1:]))
-
-#         # cell_predictions = list(zip(cp, cell.candidates))
-#         # cell_predictions.sort(key=lambda x: x[0], reverse=True)
-
-#         cell_predictions = model.predict(cell_features)
-#         # cell_predictions = list(zip(cell_predictions, cell.candidates))
-#         cell_predictions = list(zip(cell_predictions, cell.candidates_spellchecked))
-#         cell_predictions.sort(key=lambda x: x[0], reverse=True)
-
-#         # print(f"Predictions for mention: '{cell.mention}'")
-#         # print(f"Candidates:")
-#         # for pred in cell_predictions:
-#         #     print(f"    {pred[0]}: {pred[1].title} ({pred[1].description})")
-
-#         # print(f"Prediction:")
-#         if cell_predictions[0][1].id == cell.correct_candidate.id:
-#             # print(f"    CORRECT: {cell_predictions[0][1].title} ({cell_predictions[0][1].description})")
-#             total_correct += 1
-#         else:
-#             try:
-#                 correct_candidate = next(
-#                     # candidate for candidate in cell.candidates if candidate.id == cell.correct_candidate.id
-#                     candidate
-#                     for candidate in cell.candidates_spellchecked
-#                     if candidate.id == cell.correct_candidate.id
-#                 )
-#                 # print(f"    INCORRECT - Should have been: {correct_candidate.title} ({correct_candidate.description})")
-#             except StopIteration:
-#                 # print(f"    INCORRECT - No correct candidate found :)")
-#                 pass
-#             total_incorrect += 1
-
-#         # print()
-#         # print()
-
-# print(f"Total correct: {total_correct}")
-# print(f"Total incorrect: {total_incorrect}")
-# print(f"Accuracy: {total_correct / (total_correct + total_incorrect)}")
+def fetch(cols: list[Column], done, spellchecked: bool):
+    def is_fetched(col: Column) -> bool:
+        if spellchecked:
+            return col.all_cells_fetched_spellchecked()
+        return col.all_cells_fetched()
+
+    def on_column_fetched(col: Column):
+        # columns hit by rate limits are left for the next run
+        if is_fetched(col):
+            done(col)
+
+    for col in cols:
+        if is_fetched(col):
+            done(col)
+    fetch_dataset(
+        [col for col in cols if not is_fetched(col)],
+        spellchecked=spellchecked,
+        on_column_fetched=on_column_fetched,
+    )
+
+    entity_cache = get_entity_cache()
+    print(f"Entity cache: {entity_cache.hits} hits, {entity_cache.misses} misses")
+    search_cache = get_search_cache()
+    print(f"Search cache: {search_cache.hits} hits, {search_cache.misses} misses")
+
+
+def main():
+    # ----- Open dataset -----
+    # every stage records the columns it has finished in the run's journal, so
+    # rerunning this script picks up where the last run stopped
+    runner = PipelineRunner("test-data", lambda: open_dataset(use_test_data=True))
+    store = FeatureStore(f"{runner.folder}/features.h5")
+
+    # ----- Preprocess dataset -----
+    @runner.column_stage("spellcheck")
+    def spellcheck(cols: list[Column], done):
+        spellcheck_columns(cols, on_column_spellchecked=done)
+
+    @runner.column_stage("fetch")
+    def fetch_candidates(cols: list[Column], done):
+        fetch(cols, done, spellchecked=False)
+
+    @runner.column_stage("fetch-spellchecked")
+    def fetch_candidates_spellchecked(cols: list[Column], done):
+        fetch(cols, done, spellchecked=True)
+
+    # ----- Generate features -----
+    # the features are kept in the feature store, so the columns are not pickled again
+    # both variants are computed together, sharing the work when the spellchecker
+    # left a column's mentions unchanged
+    @runner.column_stage("features", snapshot=False)
+    def features(cols: list[Column], done):
+        for col in tqdm(cols):
+            col.compute_variant_features()
+            store.append(col)
+            store.append(col, spellchecked=True)
+            done(col)
+
+    @runner.column_stage("features-spellchecked", snapshot=False)
+    def features_spellchecked(cols: list[Column], done):
+        for col in tqdm(cols):
+            if not store.has_column(col, spellchecked=True):
+                col.compute_features_spellchecked()
+                store.append(col, spellchecked=True)
+            done(col)
+
+    # ----- Train ranker -----
+    @runner.step("train")
+    def train():
+        return train_ranker(store)
+
+    # ----- Evaluate ranker -----
+    # only the tables the ranker held out of training are scored
+    @runner.step("evaluate")
+    def evaluate():
+        model, test_tables = runner.result("train")
+        cols = [col for col in runner.cols if col.cells[0].table in test_tables]
+        for col in cols:
+            if not col.features_fetched_spellchecked:
+                store.load_features(col, spellchecked=True)
+
+        predictions = rank_cells(model, cols, spellchecked=True)
+        f1, precision, recall = cea_scores(cols, predictions)
+
+        print(f"Precision: {precision}")
+        print(f"Recall: {recall}")
+        print(f"F1: {f1}")
+        return (f1, precision, recall)
+
+    runner.run()
+
+
+# the stages run in a guard, so process pools that import this module in
+# their workers do not start the pipeline again
+if __name__ == "__main__":
+    main()
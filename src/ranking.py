@@ -0,0 +1,168 @@
+from typing import Union
+import numpy as np
+from classes import Candidate, Column
+
+
+def grouped_argmax(scores: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Finds the index of the highest score within each consecutive group of
+    scores. Ties go to the first candidate, and empty groups get -1.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        The scores of all groups, one after another.
+    lengths : np.ndarray
+        The length of every group.
+
+    Returns
+    -------
+    np.ndarray
+        The index of the best score within every group, or -1.
+
+    Example
+    -------
+    >>> grouped_argmax(np.array([0.1, 0.7, 0.3, 0.9]), np.array([3, 0, 1]))
+    array([ 1, -1,  0])
+    """
+
+    best = np.full(len(lengths), -1, dtype=np.int64)
+    non_empty = np.flatnonzero(lengths > 0)
+    if len(non_empty) == 0:
+        return best
+
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    maxima = np.maximum.reduceat(scores, starts[non_empty])
+    group_of = np.repeat(np.arange(len(non_empty)), lengths[non_empty])
+    is_max = np.flatnonzero(scores == maxima[group_of])
+    groups, first = np.unique(group_of[is_max], return_index=True)
+    best[non_empty[groups]] = is_max[first] - starts[non_empty[groups]]
+    return best
+
+
+def rank_cells(
+    model, cols: list[Column], spellchecked: bool = True
+) -> list[list[Union[Candidate, None]]]:
+    """
+    Picks the best candidate of every cell in the given columns. The features
+    of all candidates are scored with a single call to `model.predict`.
+
+    Parameters
+    ----------
+    model
+        A trained model with a `predict` method, e.g. `training.train_ranker`
+        or a regressor from util.
+    cols : list[Column]
+        The columns to rank, with their features computed.
+    spellchecked : bool, optional
+        Whether to rank the spellchecked candidates, by default True
+
+    Returns
+    -------
+    list[list[Union[Candidate, None]]]
+        The best candidate of every cell, per column. Cells without candidates
+        get None.
+
+    Example
+    -------
+    >>> predictions = rank_cells(model, cols)
+    >>> predictions[0][0].id == cols[0].cells[0].correct_id
+    True
+    """
+
+    candidate_lists = [
+        cell.candidates_spellchecked if spellchecked else cell.candidates
+        for col in cols
+        for cell in col.cells
+    ]
+    features = [
+        candidate.features_spellchecked() if spellchecked else candidate.features()
+        for candidates in candidate_lists
+        for candidate in candidates
+    ]
+    lengths = np.array([len(candidates) for candidates in candidate_lists])
+
+    scores = (
+        model.predict(np.array(features, dtype=np.float64))
+        if len(features) > 0
+        else np.zeros(0)
+    )
+    best = grouped_argmax(np.asarray(scores), lengths)
+
+    predictions: list[list[Union[Candidate, None]]] = []
+    i = 0
+    for col in cols:
+        col_predictions = []
+        for _ in col.cells:
+            col_predictions.append(
+                candidate_lists[i][best[i]] if best[i] >= 0 else None
+            )
+            i += 1
+        predictions.append(col_predictions)
+
+    return predictions
+
+
+def cea_scores(
+    cols: list[Column], predictions: list[list[Union[Candidate, int, None]]]
+) -> tuple[float, float, float]:
+    """
+    Scores predicted entities the way the CEA evaluator scores a submission,
+    without writing a submission file. Only cells with a known correct entity
+    count, and a cell predicted as None counts as not annotated.
+
+    Parameters
+    ----------
+    cols : list[Column]
+        The columns that were ranked.
+    predictions : list[list[Union[Candidate, int, None]]]
+        The predicted candidate or QID of every cell, per column, e.g. the
+        output of `rank_cells`.
+
+    Returns
+    -------
+    tuple[float, float, float]
+        The F1 score, precision and recall.
+
+    Example
+    -------
+    >>> f1, precision, recall = cea_scores(cols, rank_cells(model, cols))
+    """
+
+    predicted = np.array(
+        [
+            -1
+            if prediction is None
+            else prediction.id
+            if isinstance(prediction, Candidate)
+            else prediction
+            for col_predictions in predictions
+            for prediction in col_predictions
+        ],
+        dtype=np.int64,
+    )
+    correct = np.array(
+        [
+            cell.correct_id if cell.correct_id is not None else -1
+            for col in cols
+            for cell in col.cells
+        ],
+        dtype=np.int64,
+    )
+    if len(predicted) != len(correct):
+        raise Exception("The predictions do not match the cells of the columns!")
+
+    # like the evaluator, annotations of cells outside the ground truth are ignored
+    in_gt = correct >= 0
+    gt_cells = int(np.count_nonzero(in_gt))
+    annotated_cells = int(np.count_nonzero(in_gt & (predicted >= 0)))
+    correct_cells = int(np.count_nonzero(in_gt & (predicted == correct)))
+
+    precision = correct_cells / annotated_cells if annotated_cells > 0 else 0.0
+    recall = correct_cells / gt_cells if gt_cells > 0 else 0.0
+    f1 = (
+        (2 * precision * recall) / (precision + recall)
+        if (precision + recall) > 0
+        else 0.0
+    )
+    return f1, precision, recall
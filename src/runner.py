@@ -0,0 +1,178 @@
+import os
+import pickle
+from typing import TYPE_CHECKING, Any, Callable, Union
+from util import ROOTPATH
+
+if TYPE_CHECKING:
+    from classes import Column
+
+
+def unit_key(col: "Column") -> str:
+    return f"{col.cells[0].table}-{col.cells[0].col}"
+
+
+class Journal:
+    """
+    An append-only log of the units each stage has completed. Completed units
+    are kept in a set, so checking a unit is O(1).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: set[tuple[str, str]] = set()
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    # a partially written last line is ignored
+                    if line.endswith("\n"):
+                        stage, unit = line[:-1].split("\t")
+                        self.done.add((stage, unit))
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, stage: str, unit: str) -> bool:
+        return (stage, unit) in self.done
+
+    def mark_done(self, stage: str, unit: str) -> None:
+        self._file.write(f"{stage}\t{unit}\n")
+        self._file.flush()
+        self.done.add((stage, unit))
+
+
+class Stage:
+    name: str
+    func: Callable
+    per_column: bool
+    snapshot: bool
+
+    def __init__(self, name: str, func: Callable, per_column: bool, snapshot: bool):
+        self.name = name
+        self.func = func
+        self.per_column = per_column
+        self.snapshot = snapshot
+
+
+class PipelineRunner:
+    """
+    Runs a sequence of stages over the columns of a dataset, recording every
+    completed unit in a journal so a restarted run skips finished work.
+
+    Column stages get the columns they have not completed yet and a `done`
+    callback to call for each finished column. A column only reaches a stage
+    once every earlier column stage has completed it, so e.g. a column whose
+    fetch was rate limited is not given to the feature stages. Unless the
+    stage keeps its own output (e.g. in a FeatureStore), the finished column
+    is pickled on its own, so a checkpoint only writes that column. Step
+    stages run once every column has completed every earlier column stage,
+    and their return value is pickled.
+
+    Parameters
+    ----------
+    name : str
+        The name of the run, used for its folder in `pickle-dumps/runs`.
+    load_columns : Callable[[], list[Column]]
+        Loads the columns of the dataset, e.g. `open_dataset`.
+
+    Example
+    -------
+    >>> runner = PipelineRunner("valid", open_dataset)
+    >>> @runner.column_stage("spellcheck")
+    ... def spellcheck(cols, done):
+    ...     for col in cols:
+    ...         col.get_spellchecked_mentions()
+    ...         done(col)
+    >>> runner.run()
+    """
+
+    def __init__(self, name: str, load_columns: Callable[[], list["Column"]]):
+        self.folder = f"{ROOTPATH}/src/pickle-dumps/runs/{name}"
+        os.makedirs(f"{self.folder}/units", exist_ok=True)
+        self.journal = Journal(f"{self.folder}/journal.tsv")
+        self.stages: list[Stage] = []
+        self._load_columns = load_columns
+        self._cols: Union[list["Column"], None] = None
+
+    @property
+    def cols(self) -> list["Column"]:
+        """
+        The columns of the dataset, with every column that has been
+        checkpointed replaced by its latest snapshot.
+        """
+
+        if self._cols is None:
+            cols = [col for col in self._load_columns() if len(col.cells) > 0]
+            for i, col in enumerate(cols):
+                path = self._unit_path(unit_key(col))
+                if os.path.isfile(path):
+                    with open(path, "rb") as f:
+                        cols[i] = pickle.load(f)
+            self._cols = cols
+        return self._cols
+
+    def _unit_path(self, unit: str) -> str:
+        return f"{self.folder}/units/{unit}.pickle"
+
+    def _save(self, path: str, obj: Any) -> None:
+        # write to a temporary file first so a crash never leaves a broken pickle
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(obj, f)
+        os.replace(f"{path}.tmp", path)
+
+    def column_stage(self, name: str, snapshot: bool = True):
+        def register(func: Callable[[list["Column"], Callable[["Column"], None]], None]):
+            self.stages.append(Stage(name, func, per_column=True, snapshot=snapshot))
+            return func
+
+        return register
+
+    def step(self, name: str):
+        def register(func: Callable[[], Any]):
+            self.stages.append(Stage(name, func, per_column=False, snapshot=True))
+            return func
+
+        return register
+
+    def result(self, name: str) -> Any:
+        with open(f"{self.folder}/{name}.pickle", "rb") as f:
+            return pickle.load(f)
+
+    def run(self) -> None:
+        # the columns every column stage so far has completed
+        ready: Union[list["Column"], None] = None
+
+        for stage in self.stages:
+            if not stage.per_column:
+                if self.journal.is_done(stage.name, "all"):
+                    continue
+                if ready is not None and len(ready) < len(self.cols):
+                    # later steps depend on this one, so they wait as well
+                    print(
+                        f"Skipping {stage.name}, "
+                        f"{len(self.cols) - len(ready)} columns are not done yet"
+                    )
+                    return
+                print(f"Running {stage.name}...")
+                self._save(f"{self.folder}/{stage.name}.pickle", stage.func())
+                self.journal.mark_done(stage.name, "all")
+                continue
+
+            if ready is None:
+                ready = self.cols
+            pending = [
+                col
+                for col in ready
+                if not self.journal.is_done(stage.name, unit_key(col))
+            ]
+            if len(pending) > 0:
+                print(f"Running {stage.name} on {len(pending)} columns...")
+
+                def done(col: "Column", stage: Stage = stage) -> None:
+                    unit = unit_key(col)
+                    if stage.snapshot:
+                        self._save(self._unit_path(unit), col)
+                    self.journal.mark_done(stage.name, unit)
+
+                stage.func(pending, done)
+
+            ready = [
+                col for col in ready if self.journal.is_done(stage.name, unit_key(col))
+            ]
@@ -1,35 +1,21 @@
-import re
-import json
-from numpy import empty
 import os
 import html
-from decouple import config
 from bestmatch import get_best_title_match
-from preprocessing.preprocesschecker import (
-    check_spellchecker,
-    check_spellchecker_threaded,
-)
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Union
+from bingindex import bing_search_index
 from pathlib import Path
 
-from util import pickle_load, pickle_save
 
 rootpath = str(Path(__file__).parent.parent.parent)
-src_folder = "/Users/alankhorsid/Documents/semtex/datasets/BingSearchResults"
+
+# the suggestion for every mention corrected by this process
+suggestion_cache: dict[str, str] = {}
 
 
 def search_for_JSON(query):
-    for filename in os.listdir(src_folder):
-        if filename.endswith(".json"):
-            filepath = os.path.join(src_folder, filename)
-            with open(filepath, "r") as f:
-                json_data = json.load(f)
-                if (
-                    json_data["_type"] == "SearchResponse"
-                    and json_data["queryContext"]["originalQuery"].lower()
-                    == query.lower()
-                ):
-                    return json_data
-    return query
+    json_data = bing_search_index.lookup(query)
+    return json_data if json_data is not None else query
 
 
 def generate_suggestion(query):
@@ -66,4 +52,63 @@ def generate_suggestion(query):
             return query
 
 
-check_spellchecker(generate_suggestion, only_hard=True)
+def generate_suggestions(
+    queries: list[str], processes: Union[int, None] = None
+) -> Iterator[tuple[str, str]]:
+    """
+    Generates the suggestion of every distinct query. Queries that have been
+    corrected before are answered from memory, and the rest are spread over a
+    pool of processes, since matching titles is CPU-bound.
+
+    Parameters
+    ----------
+    queries : list[str]
+        The queries to correct. Repeated queries are corrected once.
+    processes : int, optional
+        The number of worker processes, by default one per CPU core. With 1,
+        the queries are corrected in this process.
+
+    Returns
+    -------
+    Iterator[tuple[str, str]]
+        Every distinct query with its suggestion.
+
+    Example
+    -------
+    >>> dict(generate_suggestions(["Dharman", "Jan Švankmajer", "Dharman"]))
+    {'Dharman': 'Dhar Mann', 'Jan Švankmajer': 'Jan Svankmajer'}
+    """
+
+    pending = []
+    for query in dict.fromkeys(queries):
+        if query in suggestion_cache:
+            yield query, suggestion_cache[query]
+        else:
+            pending.append(query)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(pending))
+
+    if processes <= 1:
+        suggestions = map(generate_suggestion, pending)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=processes)
+        # several queries per task keep the overhead of sending them down
+        chunksize = max(1, len(pending) // (processes * 8))
+        suggestions = executor.map(generate_suggestion, pending, chunksize=chunksize)
+
+    try:
+        for query, suggestion in zip(pending, suggestions):
+            suggestion_cache[query] = suggestion
+            yield query, suggestion
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    from preprocessing.preprocesschecker import check_spellchecker
+
+    check_spellchecker(generate_suggestion, only_hard=True)
@@ -0,0 +1,160 @@
+from typing import TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    from featurestore import FeatureStore
+
+# the features the ranker sees; the first feature is the candidate's QID, an
+# identifier that would only let the model memorize the training tables
+RANKER_FEATURES = slice(1, None)
+
+
+class CellRanker:
+    """
+    A trained ranker that takes the full feature vectors of `rank_cells` and
+    scores them on RANKER_FEATURES only.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return self.model.predict(np.asarray(features)[:, RANKER_FEATURES])
+
+
+def candidate_groups(keys: np.ndarray) -> np.ndarray:
+    """
+    Numbers the cells of the candidates in a FeatureStore, so the candidates
+    of one CandidateSet share a group. The candidates of a cell are stored
+    next to each other, so the group ids never decrease.
+
+    Parameters
+    ----------
+    keys : np.ndarray
+        The (table, row, col, qid) keys of the candidates, as stored.
+
+    Returns
+    -------
+    np.ndarray
+        The group id of every candidate.
+
+    Example
+    -------
+    >>> keys, _, _ = store.arrays()
+    >>> candidate_groups(keys[:])
+    array([0, 0, 0, 1, 1, 2, ...])
+    """
+
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+    new_cell = (
+        (keys["table"][1:] != keys["table"][:-1])
+        | (keys["row"][1:] != keys["row"][:-1])
+        | (keys["col"][1:] != keys["col"][:-1])
+    )
+    return np.concatenate(([0], np.cumsum(new_cell))).astype(np.int64)
+
+
+def split_by_table(
+    tables: np.ndarray, test_size: float = 0.3, random_state: int = 42
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Splits candidates into a training and a test set, keeping every table on
+    one side, so no cell (or its neighbours in the table) is on both sides.
+    The indices of each side stay in their stored order.
+
+    Parameters
+    ----------
+    tables : np.ndarray
+        The table of every candidate.
+    test_size : float, optional
+        The share of tables to test on, by default 0.3
+    random_state : int, optional
+        The seed of the split, by default 42
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The indices of the training and the test candidates.
+    """
+
+    from sklearn.model_selection import GroupShuffleSplit
+
+    splitter = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
+    train, test = next(splitter.split(np.zeros(len(tables)), groups=tables))
+    return np.sort(train), np.sort(test)
+
+
+def train_ranker(
+    store: "FeatureStore",
+    spellchecked: bool = False,
+    test_size: float = 0.3,
+    validation_size: float = 0.2,
+    n_jobs: int = -1,
+) -> tuple[CellRanker, set[str]]:
+    """
+    Trains an XGBoost ranker on the candidates of a FeatureStore. Candidates
+    are ranked against the other candidates of their cell instead of being
+    regressed one by one, and the split into training and test data is made
+    by table. The test tables are left out entirely and returned, so the
+    ranker can be evaluated on tables it has never seen. Early stopping uses a
+    separate share of the training tables.
+
+    Parameters
+    ----------
+    store : FeatureStore
+        The store holding the features and labels of the candidates.
+    spellchecked : bool, optional
+        Whether to train on the spellchecked candidates, by default False
+    test_size : float, optional
+        The share of tables to hold out, by default 0.3
+    validation_size : float, optional
+        The share of the remaining tables to stop training early on, by
+        default 0.2
+    n_jobs : int, optional
+        The number of threads to train with, by default -1 (all cores)
+
+    Returns
+    -------
+    tuple[CellRanker, set[str]]
+        The trained ranker, which can be passed to `rank_cells`, and the
+        held-out tables.
+
+    Example
+    -------
+    >>> model, test_tables = train_ranker(FeatureStore(f"{runner.folder}/features.h5"))
+    >>> test_cols = [col for col in cols if col.cells[0].table in test_tables]
+    >>> predictions = rank_cells(model, test_cols)
+    """
+
+    import xgboost as xgb
+
+    keys, features, labels = store.arrays(spellchecked)
+    keys, features, labels = keys[:], features[:, RANKER_FEATURES], labels[:]
+    groups = candidate_groups(keys)
+    train, test = split_by_table(keys["table"], test_size)
+    fit, validation = split_by_table(keys["table"][train], validation_size)
+    fit, validation = train[fit], train[validation]
+
+    ranker = xgb.XGBRanker(
+        objective="rank:pairwise",
+        tree_method="hist",
+        n_jobs=n_jobs,
+        n_estimators=300,
+        learning_rate=0.1,
+        max_depth=6,
+        eval_metric="ndcg@1",
+        early_stopping_rounds=20,
+        random_state=42,
+    )
+    ranker.fit(
+        features[fit],
+        labels[fit],
+        qid=groups[fit],
+        eval_set=[(features[validation], labels[validation])],
+        eval_qid=[groups[validation]],
+        verbose=False,
+    )
+
+    test_tables = {table.decode() for table in np.unique(keys["table"][test])}
+    return CellRanker(ranker), test_tables
@@ -1,44 +1,19 @@
 import csv
 import os
-from typing import Union
-from nltk.corpus import stopwords
-import string
-import numpy as np
-import pandas as pd
-from tqdm import tqdm
-from sklearn.ensemble import (
-    GradientBoostingRegressor,
-    HistGradientBoostingRegressor,
-    RandomForestRegressor,
-)
-from sklearn.model_selection import cross_val_score, train_test_split
-from sklearn.metrics import mean_squared_error
-from sklearn.tree import export_text
 import pickle
+import string
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.metrics import mean_squared_error
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import mean_squared_error
-from sklearn.ensemble import HistGradientBoostingRegressor
-import matplotlib.pyplot as plt
-import spacy
-from collections import Counter
-import en_core_web_sm
-from _types import SpacyTypes
+from functools import lru_cache
 from pathlib import Path
+from typing import Iterable, Union
+from _types import EntityInfo, SpacyTypes
 
-ROOTPATH = Path(__file__).parent.parent
+# sklearn, xgboost, pandas, matplotlib, nltk and spaCy are imported by the
+# functions using them, so importing util stays fast
 
-import numpy as np
-import xgboost as xgb
-from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
-from sklearn.metrics import mean_squared_error
-import numpy as np
-import xgboost as xgb
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.metrics import make_scorer
+ROOTPATH = Path(__file__).parent.parent
 
 
 # Your custom metric function
@@ -50,6 +25,10 @@ def custom_metric(y_true, y_pred):
 
 
 def xgb_regression_hyperparameter_tuning(data, labels, test_size=0.3):
+    import xgboost as xgb
+    from sklearn.metrics import make_scorer
+    from sklearn.model_selection import GridSearchCV, train_test_split
+
     # Split the dataset into training and testing sets
     X_train, X_test, y_train, y_test = train_test_split(
         data, labels, test_size=test_size, random_state=42
@@ -102,6 +81,9 @@ def xgb_regression_hyperparameter_tuning(data, labels, test_size=0.3):
 
 
 def ensemble_hist_gradient_boost_regression(data, labels, test_size=0.3):
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.model_selection import train_test_split
+
     # Split the dataset into training and testing sets
     X_train, X_test, y_train, y_test = train_test_split(
         data, labels, test_size=test_size, random_state=42
@@ -127,6 +109,10 @@ def ensemble_hist_gradient_boost_regression(data, labels, test_size=0.3):
 
 
 def gbr_hyperparameters_tuning(data, labels, test_size=0.3):
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.metrics import make_scorer
+    from sklearn.model_selection import GridSearchCV, train_test_split
+
     # Split the dataset into training and testing sets
     X_train, X_test, y_train, y_test = train_test_split(
         data, labels, test_size=test_size, random_state=42
@@ -167,6 +153,9 @@ def gbr_hyperparameters_tuning(data, labels, test_size=0.3):
 
 
 def ensemble_gradient_boost_regression(data, labels, test_size=0.3):
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.model_selection import train_test_split
+
     # Split the dataset into training and testing sets
     X_train, X_test, y_train, y_test = train_test_split(
         data, labels, test_size=test_size, random_state=42
@@ -193,6 +182,9 @@ def ensemble_gradient_boost_regression(data, labels, test_size=0.3):
 
 
 def random_forest_regression(data: list, labels: list[float], test_size: float = 0.3):
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import train_test_split
+
     # Split the dataset into training and testing sets
     X_train, X_test, y_train, y_test = train_test_split(
         data, labels, test_size=test_size
@@ -210,6 +202,9 @@ def random_forest_regression(data: list, labels: list[float], test_size: float =
 
 
 def plot_feature_importance(model, data):
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
     # Convert the data list to a DataFrame
     data_df = pd.DataFrame(data)
     # Calculate the feature importances
@@ -238,6 +233,20 @@ def plot_feature_importance(model, data):
     plt.show()
 
 
+PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+
+@lru_cache(maxsize=None)
+def english_stop_words() -> frozenset[str]:
+    """
+    Returns the NLTK English stop words, loading the corpus on first use.
+    """
+
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words("english"))
+
+
 def remove_stopwords(unfiltered_string: str) -> str:
     """
     Filters a string by removing stop words and punctuations.
@@ -257,9 +266,8 @@ def remove_stopwords(unfiltered_string: str) -> str:
     >>> remove_stopwords("The quick brown fox jumps over the lazy dog.")
     "quick brown fox jumps lazy dog"
     """
-    translator = str.maketrans("", "", string.punctuation)
-    filtered_words = unfiltered_string.translate(translator)
-    stop_words = set(stopwords.words("english"))
+    filtered_words = unfiltered_string.translate(PUNCTUATION_TABLE)
+    stop_words = english_stop_words()
     filtered_words = [
         word for word in filtered_words.split() if word.lower() not in stop_words
     ]
@@ -295,21 +303,58 @@ def get_csv_lines(filename: str) -> list[list[str]]:
         return list(reader)
 
 
-def open_dataset(correct_spelling: bool = False, use_test_data: bool = False):
+def read_table_mentions(filename: str, positions: list[tuple[int, int]]) -> list[str]:
     """
-    Opens the dataset and returns a list of (mention, id) tuples.
+    Reads the mentions at the given (row, col) positions of a table. Only the
+    rows holding one of the positions are kept, and reading stops after the
+    last of them.
 
     Parameters
     ----------
-    correct_spelling : bool, optional
-        Whether to return the correctly preprocessed mentions or the mentions
+    filename : str
+        The path to the table's CSV file.
+    positions : list[tuple[int, int]]
+        The (row, col) of every mention, where row 0 is the header.
+
+    Returns
+    -------
+    list[str]
+        The mention at every position, in the same order.
+    """
 
+    rows = {row for row, _ in positions}
+    lines: dict[int, list[str]] = {}
+    with open(filename, "r", encoding="utf-8") as f:
+        for i, line in enumerate(csv.reader(f)):
+            if i in rows:
+                lines[i] = line
+                if len(lines) == len(rows):
+                    break
+    return [lines[row][col] for row, col in positions]
+
+
+def iter_dataset(use_test_data: bool = False, processes: int = 1):
+    """
+    Reads the dataset one table at a time and yields its columns. The ground
+    truth is grouped by table in a single pass, and only one table (or a few,
+    when parsing in parallel) is read at any time.
+
+    Parameters
+    ----------
     use_test_data : bool, optional
         Whether to use the test data or the validation data
+    processes : int, optional
+        The number of processes parsing tables, by default 1 (no pool). The
+        columns are yielded in the same order either way.
 
     Returns
     -------
-    list[Column]
+    Iterator[Column]
+
+    Example
+    -------
+    >>> for col in iter_dataset(use_test_data=True, processes=4):
+    ...     print(col.cells[0].table, len(col.cells))
     """
 
     from classes import CandidateSet, Column
@@ -319,36 +364,82 @@ def open_dataset(correct_spelling: bool = False, use_test_data: bool = False):
         if use_test_data
         else f"{ROOTPATH}/datasets/HardTablesR1/DataSets/HardTablesR1/Valid"
     )
-    gt_lines = get_csv_lines(f"{file_path}/gt/cea_gt.csv")
-    gt_lines = [[l[0], int(l[1]), int(l[2]), l[3]] for l in gt_lines]
-
-    current_filename = ""
-    lines = []
-    cols: list[Column] = []
-    for filename, _, _, _ in gt_lines:
-        if filename == current_filename:
-            continue
-        current_filename = filename
-
-        file = get_csv_lines(f"{file_path}/tables/{filename}.csv")
-
-        lines = [l for l in gt_lines if l[0] == filename]
-        lines.sort(key=lambda x: (x[2], x[1]))
-
-        current_col = -1
-        new_cols: list[Column] = []
-        for _, row, col, entity_url in lines:
-            if col != current_col:
-                current_col = col
-                new_cols.append(Column())
-
-            mention = file[row][col]
+
+    # the ground truth of every table, in the order the tables first appear
+    tables: dict[str, list[tuple[int, int, str]]] = {}
+    with open(f"{file_path}/gt/cea_gt.csv", "r", encoding="utf-8") as f:
+        for filename, row, col, entity_url in csv.reader(f):
+            tables.setdefault(filename, []).append((int(row), int(col), entity_url))
+
+    def table_columns(filename: str, lines: list, mentions: list[str]):
+        column: Union[Column, None] = None
+        for (row, col, entity_url), mention in zip(lines, mentions):
+            if column is None or col != column.cells[0].col:
+                if column is not None:
+                    yield column
+                column = Column()
+
             entity_id = entity_url.split("/")[-1]
-            new_cols[-1].add_cell(CandidateSet(mention, correct_id=entity_id))
+            column.add_cell(
+                CandidateSet(
+                    mention, correct_id=entity_id, table=filename, row=row, col=col
+                )
+            )
+        if column is not None:
+            yield column
+
+    def table_jobs():
+        for filename, lines in tables.items():
+            lines.sort(key=lambda x: (x[1], x[0]))
+            positions = [(row, col) for row, col, _ in lines]
+            yield filename, lines, f"{file_path}/tables/{filename}.csv", positions
+
+    if processes <= 1:
+        for filename, lines, table_path, positions in table_jobs():
+            yield from table_columns(
+                filename, lines, read_table_mentions(table_path, positions)
+            )
+        return
+
+    # keep a bounded number of tables in flight, so memory does not grow
+    # with the size of the dataset
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        in_flight = deque()
+        for filename, lines, table_path, positions in table_jobs():
+            in_flight.append(
+                (filename, lines, executor.submit(read_table_mentions, table_path, positions))
+            )
+            if len(in_flight) >= processes * 4:
+                filename, lines, future = in_flight.popleft()
+                yield from table_columns(filename, lines, future.result())
+        while len(in_flight) > 0:
+            filename, lines, future = in_flight.popleft()
+            yield from table_columns(filename, lines, future.result())
+
+
+def open_dataset(
+    correct_spelling: bool = False, use_test_data: bool = False, processes: int = 1
+):
+    """
+    Opens the dataset and returns a list of (mention, id) tuples.
 
-        cols.extend(new_cols)
+    Parameters
+    ----------
+    correct_spelling : bool, optional
+        Whether to return the correctly preprocessed mentions or the mentions
 
-    return cols
+    use_test_data : bool, optional
+        Whether to use the test data or the validation data
+
+    processes : int, optional
+        The number of processes parsing tables, by default 1
+
+    Returns
+    -------
+    list[Column]
+    """
+
+    return list(iter_dataset(use_test_data, processes))
 
 
 def parse_entity_title(entity_data: dict) -> Union[str, None]:
@@ -405,7 +496,9 @@ def parse_entity_description(entity_data: dict) -> Union[str, None]:
         return None
 
 
-def parse_entity_properties(entity_data: dict) -> dict:
+def parse_entity_properties(
+    entity_data: dict, properties: Union[Iterable[str], None] = None
+) -> dict:
     """
     Parses the claims of an entity from the Wikidata API.
 
@@ -413,6 +506,9 @@ def parse_entity_properties(entity_data: dict) -> dict:
     ----------
     entity_data : dict
         The entity data to parse.
+    properties : Iterable[str], optional
+        The properties to parse, e.g. ["P31"]. The claims of other properties
+        are skipped without being looked at. By default all are parsed.
 
     Returns
     -------
@@ -428,8 +524,14 @@ def parse_entity_properties(entity_data: dict) -> dict:
     ]
     """
 
-    properties = []
-    for claims in entity_data["claims"].values():
+    all_claims = entity_data.get("claims", {})
+    if properties is None:
+        claim_lists = all_claims.values()
+    else:
+        claim_lists = [all_claims[prop] for prop in properties if prop in all_claims]
+
+    parsed = []
+    for claims in claim_lists:
         for claim in claims:
             try:
                 if (
@@ -441,14 +543,45 @@ def parse_entity_properties(entity_data: dict) -> dict:
 
                 prop = claim["mainsnak"]["property"]
                 target = claim["mainsnak"]["datavalue"]["value"]["id"]
-                properties.append((prop, target))
+                parsed.append((prop, target))
             except KeyError:
                 continue
             except:
                 print("----- ERROR -------")
                 print(claims)
 
-    return properties
+    return parsed
+
+
+def parse_entity_info(entity_data: dict) -> EntityInfo:
+    """
+    Parses the title, description, instances (P31) and subclasses (P279) of an
+    entity from the Wikidata API.
+
+    Parameters
+    ----------
+    entity_data : dict
+        The entity data to parse.
+
+    Returns
+    -------
+    EntityInfo
+        The parsed entity.
+
+    Example
+    -------
+    >>> parse_entity_info(wikidata_get_entity(76))
+    {"title": "Barack Obama", "description": "...", "instances": [5], "subclasses": [], "revision": 1874535912}
+    """
+
+    properties = parse_entity_properties(entity_data, ["P31", "P279"])
+    return {
+        "title": parse_entity_title(entity_data) or "",
+        "description": parse_entity_description(entity_data) or "",
+        "instances": [int(prop[1][1:]) for prop in properties if prop[0] == "P31"],
+        "subclasses": [int(prop[1][1:]) for prop in properties if prop[0] == "P279"],
+        "revision": entity_data.get("lastrevid"),
+    }
 
 
 def pickle_save_in_folder(obj, folder):
@@ -498,15 +631,73 @@ def pickle_load(filename, is_dump: bool = False):
         return pickle.load(f)
 
 
-def name_entity_recognition_labels(title: str, description: str) -> list[int]:
+@lru_cache(maxsize=None)
+def ner_pipeline():
+    """
+    Returns the spaCy pipeline used for named entity recognition, loading it
+    on first use. Every component but the entity recognizer is disabled.
+    """
+
+    import en_core_web_sm
+
     nlp = en_core_web_sm.load()
-    labels = []
-    results = nlp(f"{title} - {description}")
-    for r in results.ents:
-        labels.append(r.label_)
-    labels = list(set(labels))
-    labels = [SpacyTypes[label].value for label in labels]
-    return labels
+    nlp.select_pipes(enable=["ner"])
+    return nlp
+
+
+# the named entity labels of every entity, by QID
+ner_labels_cache: dict[int, list[int]] = {}
+
+
+def entity_labels(doc) -> list[int]:
+    labels = list(set(r.label_ for r in doc.ents))
+    return [SpacyTypes[label].value for label in labels]
+
+
+def name_entity_recognition_labels(title: str, description: str) -> list[int]:
+    return entity_labels(ner_pipeline()(f"{title} - {description}"))
+
+
+def name_entity_recognition_labels_batch(
+    entities: list[tuple[int, str, str]], n_process: int = 1, batch_size: int = 256
+) -> list[list[int]]:
+    """
+    Finds the named entity labels of many entities at once, streaming their
+    texts through `nlp.pipe`. Entities whose labels have been found before are
+    taken from the cache.
+
+    Parameters
+    ----------
+    entities : list[tuple[int, str, str]]
+        The (QID, title, description) of every entity.
+    n_process : int, optional
+        The number of processes spaCy runs the pipeline in, by default 1
+    batch_size : int, optional
+        The number of texts spaCy processes at once, by default 256
+
+    Returns
+    -------
+    list[list[int]]
+        The SpacyTypes values found for every entity, in the same order.
+
+    Example
+    -------
+    >>> name_entity_recognition_labels_batch([(76, "Barack Obama", "president of the United States")])
+    [[1, 5]]
+    """
+
+    pending: dict[int, str] = {}
+    for entity_id, title, description in entities:
+        if entity_id not in ner_labels_cache:
+            pending[entity_id] = f"{title} - {description}"
+
+    docs = ner_pipeline().pipe(
+        pending.values(), n_process=n_process, batch_size=batch_size
+    )
+    for entity_id, doc in zip(pending.keys(), docs):
+        ner_labels_cache[entity_id] = entity_labels(doc)
+
+    return [ner_labels_cache[entity_id] for entity_id, _, _ in entities]
 
 
 # Merge two dictionaries and keep values of common keys in list
@@ -0,0 +1,47 @@
+import random
+import time
+from bestmatch import best_title_permutation, compare_title_permutations_with_query
+
+
+def brute_force(title: str, query: str) -> tuple[str, float]:
+    best, lowest = None, float("inf")
+    for perm, distance in compare_title_permutations_with_query(title, query):
+        if distance < lowest:
+            best, lowest = perm, distance
+    return best, lowest
+
+
+def random_title(rng: random.Random, words: int) -> str:
+    vocab = "a ab ba Lincoln, lincoln TOWN town-ship of the Σ x: ...".split()
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def test_long_titles_match_enumerating_every_permutation():
+    rng = random.Random(0)
+    for _ in range(20):
+        title = random_title(rng, rng.randint(11, 14))
+        query = random_title(rng, rng.randint(0, 5))
+        assert best_title_permutation(title, query) == brute_force(title, query)
+
+
+def test_short_titles_match_enumerating_every_permutation():
+    assert best_title_permutation(
+        "Lincoln Township, Michigan - Wikidata", "lincon township"
+    ) == ("Lincoln Township,", 0.0625)
+    assert best_title_permutation("x  y", "x y") == brute_force("x  y", "x y")
+
+
+def test_worst_case_title_is_fast():
+    # a 20-word title against a dissimilar query leaves nothing to prune; the
+    # enumeration takes about 6 seconds on it
+    rng = random.Random(1)
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+        for _ in range(20)
+    ]
+    title = " ".join(words)
+
+    start = time.perf_counter()
+    for query in ["the history of lincoln township michigan", "mnopqrstuv wxyz"]:
+        best_title_permutation(title, query)
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,70 @@
+import os
+import pickle
+from classes import Candidate, CandidateSet, Column
+
+PICKLES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src", "pickles")
+
+
+def make_candidate(qid: int, lex_score: float) -> Candidate:
+    candidate = Candidate(qid)
+    candidate.set_info(
+        {"title": f"Q{qid}", "description": "town", "instances": [486972], "subclasses": []}
+    )
+    candidate.lex_score = lex_score
+    return candidate
+
+
+def test_column_pickle_keeps_candidates_and_shared_records():
+    col = Column()
+    for row, qids in enumerate([[1, 2], [2, 3]]):
+        cell = CandidateSet(f"mention {row}", correct_id=f"Q{qids[0]}", table="T", row=row, col=0)
+        cell.candidates = [make_candidate(qid, row / 2) for qid in qids]
+        cell.correct_candidate = cell.candidates[0]
+        col.add_cell(cell)
+    col.add_cell(CandidateSet("no candidates", table="T", row=2, col=0))
+
+    loaded = pickle.loads(pickle.dumps(col))
+
+    first, second, empty = loaded.cells
+    assert [c.id for c in first.candidates] == [1, 2]
+    assert [c.lex_score for c in second.candidates] == [0.5, 0.5]
+    assert second.candidates[0].instances == (486972,)
+    assert first.correct_candidate is first.candidates[0]
+    assert first.candidates[1] is not second.candidates[0]
+    assert first.candidates[1].record is second.candidates[0].record
+    assert (second.table, second.row, second.mention) == ("T", 1, "mention 1")
+    assert empty.candidates is None
+
+
+def test_cell_pickle_keeps_candidates():
+    cell = CandidateSet("Lincoln", correct_id="Q2", table="T", row=0, col=0)
+    cell.candidates = [make_candidate(1, 0.25), make_candidate(2, 1.0)]
+    cell.correct_candidate = cell.candidates[1]
+
+    loaded = pickle.loads(pickle.dumps(cell))
+
+    assert [(c.id, c.title, c.lex_score) for c in loaded.candidates] == [
+        (1, "Q1", 0.25),
+        (2, "Q2", 1.0),
+    ]
+    assert loaded.correct_candidate is loaded.candidates[1]
+    assert loaded.correct_id == 2
+
+
+def test_old_pickles_load_and_round_trip():
+    with open(f"{PICKLES}/first-100_correct-spelling_candidate-sets.pickle", "rb") as f:
+        cells = pickle.load(f)
+    col = Column()
+    for cell in cells:
+        col.add_cell(cell)
+
+    loaded = pickle.loads(pickle.dumps(col))
+
+    def summary(cells):
+        return [
+            [(c.id, c.title, c.description, c.instances, c.subclasses) for c in cell.candidates]
+            for cell in cells
+        ]
+
+    assert summary(loaded.cells) == summary(cells)
+    assert [cell.correct_id for cell in loaded.cells] == [cell.correct_id for cell in cells]
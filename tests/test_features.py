@@ -0,0 +1,14 @@
+from classes import CandidateSet, Column
+
+
+def test_column_without_candidates_gets_features():
+    col = Column()
+    cell = CandidateSet("", correct_id="Q1", table="T", row=0, col=0)
+    cell.candidates = []
+    cell.candidates_spellchecked = []
+    col.add_cell(cell)
+
+    col.compute_variant_features()
+
+    assert col.features_fetched and col.features_fetched_spellchecked
+    assert col.feature_vectors() == ([], [])
@@ -0,0 +1,76 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import _requests
+import cache
+from _requests import RateLimiter, WikidataClient
+from classes import CandidateSet, Column
+from fetcher import fetch_dataset
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Answers every search with Q1 and Q2, except searches for "broken", whose
+    response is not a search result at all.
+    """
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        if query["action"][0] == "wbsearchentities":
+            if query["search"][0] == "broken":
+                body = {"unexpected": True}
+            else:
+                body = {"search": [{"id": "Q1"}, {"id": "Q2"}]}
+        else:
+            ids = query["ids"][0].split("|")
+            body = {
+                "entities": {
+                    qid: {"id": qid, "labels": {"en": {"value": qid}}} for qid in ids
+                }
+            }
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_wikidata(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = WikidataClient(
+        api_url=f"http://127.0.0.1:{server.server_port}/w/api.php",
+        rate_limiter=RateLimiter(max_rate=1000, burst=100),
+    )
+    monkeypatch.setattr(_requests, "client", client)
+    monkeypatch.setattr(cache, "_search_cache", cache.SearchCache())
+    monkeypatch.setattr(
+        cache, "_entity_cache", cache.EntityCache(f"{tmp_path}/entities.sqlite")
+    )
+    yield
+    server.shutdown()
+
+
+def test_failing_cell_does_not_stop_the_dataset(stub_wikidata):
+    cols = []
+    for col_index, mentions in enumerate([["Lincoln", "broken"], ["Michigan"]]):
+        col = Column()
+        for row, mention in enumerate(mentions):
+            col.add_cell(
+                CandidateSet(mention, correct_id="Q1", table="T", row=row, col=col_index)
+            )
+        cols.append(col)
+
+    fetched = []
+    fetch_dataset(cols, spellchecked=False, on_column_fetched=fetched.append)
+
+    assert len(fetched) == 2
+    lincoln, broken = cols[0].cells
+    assert [c.title for c in lincoln.candidates] == ["Q1", "Q2"]
+    assert broken.candidates is None
+    assert not cols[0].all_cells_fetched()
+    assert cols[1].all_cells_fetched()
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+# seconds each module may take to import in a fresh interpreter
+IMPORT_BUDGETS = {
+    "util": 0.25,
+    "_requests": 0.5,
+    "suggester": 0.5,
+    "classes": 1.5,
+}
+
+HEAVY_MODULES = ["sklearn", "xgboost", "matplotlib", "spacy", "pandas", "nltk"]
+
+
+def import_time(module: str) -> float:
+    """
+    Imports a module in a fresh interpreter and returns its cumulative import
+    time in seconds, as reported by `python -X importtime`.
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    raise AssertionError(f"{module} is missing from the import times")
+
+
+@pytest.mark.parametrize("module", IMPORT_BUDGETS)
+def test_import_time_budget(module):
+    # the first import also compiles the module, so only the second is timed
+    import_time(module)
+    assert import_time(module) < IMPORT_BUDGETS[module]
+
+
+def test_heavy_dependencies_are_not_imported():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, classes, suggester; "
+            f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.split() == []
@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from _requests import (
+    MAX_ENTITIES_PER_REQUEST,
+    RateLimitException,
+    RateLimiter,
+    WikidataClient,
+)
+
+
+class StubWikidata:
+    """
+    A local stand-in for the wbgetentities API. Every id is an entity labelled
+    with its QID, except the ids in `missing`, `redirects` and `invalid`.
+    """
+
+    def __init__(self):
+        self.requests: list[list[str]] = []
+        self.rate_limited = 0
+        self.bad_gateway = 0
+        self.garbled = 0
+        self.stalled = 0
+        self.missing: set[str] = set()
+        self.redirects: dict[str, str] = {}
+        self.invalid: set[str] = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                ids = parse_qs(urlparse(self.path).query)["ids"][0].split("|")
+                stub.requests.append(ids)
+                if stub.stalled > 0:
+                    stub.stalled -= 1
+                    time.sleep(1)
+                if stub.rate_limited > 0:
+                    stub.rate_limited -= 1
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    return
+                if stub.bad_gateway > 0:
+                    stub.bad_gateway -= 1
+                    self.send_response(502)
+                    self.end_headers()
+                    self.wfile.write(b"<html><body>502 Bad Gateway</body></html>")
+                    return
+                self.send_response(200)
+                self.end_headers()
+                if stub.garbled > 0:
+                    stub.garbled -= 1
+                    self.wfile.write(b"<html><body>Wikimedia error</body></html>")
+                    return
+                self.wfile.write(json.dumps(stub.respond(ids)).encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/w/api.php"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def respond(self, ids: list[str]) -> dict:
+        if any(qid in self.invalid for qid in ids):
+            return {"error": {"code": "no-such-entity", "info": "Could not find an entity"}}
+        entities = {}
+        for qid in ids:
+            if qid in self.missing:
+                entities[qid] = {"id": qid, "missing": ""}
+            elif qid in self.redirects:
+                target = self.redirects[qid]
+                entities[target] = {
+                    "id": target,
+                    "labels": {"en": {"value": target}},
+                    "redirects": {"from": qid, "to": target},
+                }
+            else:
+                entities[qid] = {"id": qid, "labels": {"en": {"value": qid}}}
+        return {"entities": entities, "success": 1}
+
+
+@pytest.fixture
+def stub():
+    stub = StubWikidata()
+    yield stub
+    stub.server.shutdown()
+
+
+def make_client(url: str, **kwargs) -> WikidataClient:
+    client = WikidataClient(
+        api_url=url, rate_limiter=RateLimiter(max_rate=1000, burst=100), **kwargs
+    )
+    client._backoff = lambda attempt: 0.0
+    return client
+
+
+@pytest.fixture
+def client(stub):
+    return make_client(stub.url)
+
+
+def test_entities_are_fetched_in_batches_of_50(stub, client):
+    entities = client.get_entities(list(range(1, 121)) + [1, 2])
+
+    assert [len(ids) for ids in stub.requests] == [50, 50, 20]
+    assert all(len(ids) <= MAX_ENTITIES_PER_REQUEST for ids in stub.requests)
+    assert sorted(entities) == list(range(1, 121))
+    assert entities[76]["labels"]["en"]["value"] == "Q76"
+
+
+def test_rate_limited_request_is_retried_after_retry_after(stub, client):
+    stub.rate_limited = 2
+
+    entities = client.get_entities([76, 30])
+
+    assert len(stub.requests) == 3
+    assert entities[30]["id"] == "Q30"
+    assert client.rate_limiter.rate < client.rate_limiter.max_rate
+
+
+def test_server_errors_and_undecodable_bodies_are_retried(stub, client):
+    stub.bad_gateway = 1
+    stub.garbled = 1
+
+    entities = client.get_entities([76])
+
+    assert len(stub.requests) == 3
+    assert entities[76]["id"] == "Q76"
+
+
+def test_request_failing_after_every_retry_raises_rate_limit_exception(stub):
+    client = make_client(stub.url, max_retries=2)
+    stub.bad_gateway = 3
+
+    with pytest.raises(RateLimitException):
+        client.get_entities([76])
+    assert len(stub.requests) == 3
+
+
+def test_unreachable_server_raises_rate_limit_exception(stub):
+    client = make_client(stub.url, max_retries=1)
+    stub.server.shutdown()
+    stub.server.server_close()
+
+    with pytest.raises(RateLimitException):
+        client.get_entities([76])
+
+
+def test_stalled_request_times_out_and_is_retried(stub):
+    client = make_client(stub.url, timeout=(1.0, 0.2))
+    stub.stalled = 1
+
+    entities = client.get_entities([76])
+
+    assert len(stub.requests) == 2
+    assert entities[76]["id"] == "Q76"
+
+
+def test_missing_and_redirected_ids_do_not_fail_the_batch(stub, client):
+    stub.missing.add("Q7")
+    stub.redirects["Q8"] = "Q9"
+
+    entities = client.get_entities([6, 7, 8])
+
+    assert len(stub.requests) == 1
+    assert entities[6]["id"] == "Q6"
+    assert "missing" in entities[7]
+    assert entities[8]["id"] == "Q9"
+
+
+def test_error_response_is_kept_to_the_bad_id(stub, client):
+    stub.invalid.add("Q7")
+
+    entities = client.get_entities([6, 7, 8])
+
+    assert entities[6]["id"] == "Q6"
+    assert entities[7]["error"] == "no-such-entity"
+    assert entities[8]["id"] == "Q8"
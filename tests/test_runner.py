@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+import runner
+from runner import PipelineRunner
+
+
+def make_columns(n: int) -> list:
+    return [SimpleNamespace(cells=[SimpleNamespace(table="T", col=i)]) for i in range(n)]
+
+
+def make_runner(tmp_path, monkeypatch, cols: list, failing: set[int]):
+    monkeypatch.setattr(runner, "ROOTPATH", str(tmp_path))
+    pipeline = PipelineRunner("test", lambda: cols)
+    calls = {"fetch": [], "features": [], "train": 0}
+
+    @pipeline.column_stage("fetch", snapshot=False)
+    def fetch(cols, done):
+        calls["fetch"].append([col.cells[0].col for col in cols])
+        for col in cols:
+            if col.cells[0].col not in failing:
+                done(col)
+
+    @pipeline.column_stage("features", snapshot=False)
+    def features(cols, done):
+        calls["features"].append([col.cells[0].col for col in cols])
+        for col in cols:
+            done(col)
+
+    @pipeline.step("train")
+    def train():
+        calls["train"] += 1
+        return "model"
+
+    return pipeline, calls
+
+
+def test_unfinished_columns_do_not_reach_later_stages(tmp_path, monkeypatch):
+    cols = make_columns(3)
+    pipeline, calls = make_runner(tmp_path, monkeypatch, cols, failing={1})
+
+    pipeline.run()
+
+    assert calls == {"fetch": [[0, 1, 2]], "features": [[0, 2]], "train": 0}
+
+
+def test_steps_run_once_every_column_is_done(tmp_path, monkeypatch):
+    cols = make_columns(3)
+    pipeline, _ = make_runner(tmp_path, monkeypatch, cols, failing={1})
+    pipeline.run()
+
+    # a restart only catches up on the column that failed before
+    pipeline, calls = make_runner(tmp_path, monkeypatch, cols, failing=set())
+    pipeline.run()
+
+    assert calls == {"fetch": [[1]], "features": [[1]], "train": 1}
+    assert pipeline.result("train") == "model"
@@ -0,0 +1,49 @@
+import numpy as np
+import training
+from featurestore import KEY_DTYPE
+from training import train_ranker
+
+
+class ArrayStore:
+    """
+    Stands in for a FeatureStore, with 40 tables of 5 cells whose correct
+    candidate has a higher lexical score.
+    """
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        keys, features, labels = [], [], []
+        for table in range(40):
+            for row in range(5):
+                correct = rng.integers(4)
+                for qid in range(4):
+                    keys.append((f"T{table}", row, 0, qid))
+                    features.append([qid, rng.random() + (qid == correct), 0, 0, 0])
+                    labels.append(float(qid == correct))
+        self.keys = np.array(keys, dtype=KEY_DTYPE)
+        self.features = np.array(features)
+        self.labels = np.array(labels)
+
+    def arrays(self, spellchecked: bool = False):
+        return self.keys, self.features, self.labels
+
+
+def test_test_tables_are_not_used_for_training_or_early_stopping(monkeypatch):
+    splits = []
+    split_by_table = training.split_by_table
+
+    def record_split(tables, size):
+        train, test = split_by_table(tables, size)
+        splits.append((set(tables[train]), set(tables[test])))
+        return train, test
+
+    monkeypatch.setattr(training, "split_by_table", record_split)
+    model, test_tables = train_ranker(ArrayStore(), n_jobs=1)
+
+    (train, test), (fit, validation) = splits
+    assert test_tables == {table.decode() for table in test}
+    assert fit | validation == train
+    assert not (fit & validation) and not (train & test)
+
+    store = ArrayStore()
+    assert model.predict(store.features).shape == (len(store.features),)